@@ -5,17 +5,27 @@ Created on Mon Aug 10 16:49:55 2020
 @author: laaltenburg
 """
 
-import numpy as np
+import os
 import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-from matplotlib.lines import Line2D
-import pandas as pd
+
+import sys
+sys.path.append('..')
+from flashback_tools import Catalog, load_compact_runs, build_event_table, detect_session, compare_with_annotations, watch_session
+from flashback_tools import load_run, report_jobs, show_figures, render_figures, run_time_ms, tc_variables_list, Profiler
+from flashback_tools import RAW_COLUMNS, DERIVED_COLUMNS, check_derived, window_statistics, pool_repeats
+from flashback_tools import monte_carlo_events, confidence_ellipses
+sys.path.append('../../physics')
+from flame_tools import FlameSpeedTable
 
 #%% START
 
 # Close all windows
 plt.close('all')
 
+# Set to True to record wall time, CPU time, peak memory and rows of every cell below, and the load time per run
+profile_stages = False
+profiler = Profiler(enabled=profile_stages)
+
 #%% COLUMN INDICES OF DATA FILE
 index_time = 0          # 0. 	Time [hh:mm:ss.xxx]
 index_T_u = 1           # 1. 	Ambient Temperature T_u [K]
@@ -69,106 +79,61 @@ index_data = -1
 # V_m = V/n = R*T_u/p_u
 
 #%% LIBRARY OF EXPERIMENTAL DATA
-# Initialize data library
-flashback_data = {}
+profiler.switch('load')
+# Catalog of the runs of this liner set, from the file names in the session_* directories (index in .catalog.json)
+catalog = Catalog.open('.')
 
-#  Dictionary with four keys: 
+#  Dictionary with four keys:
 # - key1: hydrogen content
 # - key2: phi
 # - key3: test nr
 # - key4: date
 #
-# and 5 values:
-# - value1 = phi
-# - value2 = frame index design point
-# - value3 = frame index first sign of flashback point
-# - value4 = frame index flashback point
-
-# Fill library with experimental data
-# H0
-flashback_data[('H0', '0.60', '1', '2020-07-30')] = [285, None,  475]
-flashback_data[('H0', '0.70', '1', '2020-07-28')] = [935 , None, 3670]
-flashback_data[('H0', '0.70', '2', '2020-07-30')] = [431, None, 1495]
-flashback_data[('H0', '0.80', '1', '2020-07-28')] = [242, 890, 2037]
-flashback_data[('H0', '0.80', '2', '2020-07-30')] = [320, None, 1068]
-flashback_data[('H0', '0.90', '1', '2020-07-28')] = [540, 1050, 2510]
-flashback_data[('H0', '0.90', '2', '2020-07-30')] = [170, 447, 1175]
-flashback_data[('H0', '1.00', '1', '2020-07-28')] = [660, 965, 1615]
-flashback_data[('H0', '1.00', '2', '2020-07-30')] = [420, None, 1394]
-
-# H25
-flashback_data[('H25', '0.50', '1', '2020-07-29')] = [None, None, 280]
-flashback_data[('H25', '0.50', '2', '2020-07-30')] = [None, None, 372]
-flashback_data[('H25', '0.60', '1', '2020-07-29')] = [372, None, 1092]
-flashback_data[('H25', '0.60', '2', '2020-07-30')] = [205, None, 1321]
-flashback_data[('H25', '0.70', '1', '2020-07-29')] = [340, None, 642]
-flashback_data[('H25', '0.70', '2', '2020-07-30')] = [240, None, 464]
-flashback_data[('H25', '0.80', '1', '2020-07-29')] = [445, 1167, 1427]
-flashback_data[('H25', '0.80', '2', '2020-07-30')] = [230, None, 595]
-flashback_data[('H25', '0.90', '1', '2020-07-29')] = [770, 1442, 2179]
-flashback_data[('H25', '0.90', '2', '2020-07-30')] = [327, 770, 1499]
-flashback_data[('H25', '1.00', '1', '2020-07-29')] = [669, 1560, 2408]
-
-# H50
-flashback_data[('H50', '0.50', '1', '2020-07-28')] = [585, 815, 1425]
-flashback_data[('H50', '0.50', '2', '2020-07-30')] = [600, 1210, 1610]
-flashback_data[('H50', '0.60', '1', '2020-07-29')] = [760, None, 1402]
-flashback_data[('H50', '0.60', '2', '2020-07-30')] = [510, None, 957]
-flashback_data[('H50', '0.70', '1', '2020-07-28')] = [358, 1340, 2036]
-flashback_data[('H50', '0.70', '2', '2020-07-30')] = [280, 1025, 1432]
-flashback_data[('H50', '0.80', '1', '2020-07-29')] = [30, 470, 1911]
-flashback_data[('H50', '0.80', '2', '2020-07-30')] = [90, 525, 1001]
-flashback_data[('H50', '0.90', '1', '2020-07-28')] = [290, 1260, 2805]
-flashback_data[('H50', '0.90', '2', '2020-07-30')] = [360, 720, 1485]
-
-# H75
-flashback_data[('H75', '0.35', '1', '2020-07-29')] = [1770, None, 2025]
-flashback_data[('H75', '0.35', '2', '2020-07-30')] = [819, None, 1305]
-flashback_data[('H75', '0.35', '3', '2020-07-31')] = [562, None, 951]
-flashback_data[('H75', '0.40', '1', '2020-07-29')] = [1600, 2222, 2640]
-flashback_data[('H75', '0.40', '2', '2020-07-30')] = [977, 1560, 1697]
-flashback_data[('H75', '0.40', '3', '2020-07-31')] = [369, 730, 1136]
-flashback_data[('H75', '0.50', '1', '2020-07-29')] = [64, 474, 1139]
-flashback_data[('H75', '0.50', '2', '2020-07-30')] = [95, 798, 1355]
-flashback_data[('H75', '0.50', '3', '2020-07-31')] = [None, 103, 788]
-flashback_data[('H75', '0.60', '1', '2020-07-29')] = [None, 1110, 2405]
-flashback_data[('H75', '0.60', '2', '2020-07-30')] = [None, 450, 1253]
-flashback_data[('H75', '0.60', '3', '2020-07-31')] = [None, 89, 435]
-flashback_data[('H75', '0.70', '1', '2020-07-29')] = [None, None, 82]
-flashback_data[('H75', '0.70', '2', '2020-07-29')] = [None, None, 101]
-
-# H100
-# flashback_data[('H100', '0.30', '1', '2020-07-28')] = [None, None, 3198]
-flashback_data[('H100', '0.30', '2', '2020-07-28')] = [None, None, 700]
-flashback_data[('H100', '0.30', '3', '2020-07-30')] = [None, None, 762]
-flashback_data[('H100', '0.30', '4', '2020-07-31')] = [None, None, 1230]
-flashback_data[('H100', '0.35', '1', '2020-07-29')] = [None, None, 1385]
-flashback_data[('H100', '0.35', '2', '2020-07-30')] = [None, None, 520]
-flashback_data[('H100', '0.35', '3', '2020-07-31')] = [None, None, 1188]
-flashback_data[('H100', '0.40', '1', '2020-07-28')] = [None, 2309, 2786] 
-flashback_data[('H100', '0.40', '2', '2020-07-30')] = [None, None, 2003]
-flashback_data[('H100', '0.40', '3', '2020-07-30')] = [None, 530, 1015]
-flashback_data[('H100', '0.40', '4', '2020-07-31')] = [None, None, 1236]
-flashback_data[('H100', '0.50', '1', '2020-07-28')] = [None, None, 896, 99]
-flashback_data[('H100', '0.50', '2', '2020-07-28')] = [None, None, 1942, 99]
+# and values:
+# - value1 = frame index design point
+# - value2 = frame index first sign of flashback point
+# - value3 = frame index flashback point
+#
+# The frame indices are annotated in annotations.csv, only annotated runs are used.
+# Select a subset with e.g. catalog.select(hydrogen_percentage=[75, 100], phi=(0.30, 0.45)).flashback_data()
+flashback_data = catalog.flashback_data()
+
 
+# Columns used in the plots below (names as in variables_list)
+columns_used = ['time', 'T_u_ambient', 'p_u_ambient', 'phi_meas', 'u_u_meas', 'x_H2_meas', 'Q_a1_meas', 'Q_DNG_meas', 'Q_H2_meas', 'power_meas']
+
+# Read data of all experiments in parallel, only the columns used (parsed once, then loaded from the columnar cache in session_*/.cache).
+# The runs are compact: columns that are constant during a run are stored once, the signals as float32 and the
+# time as int64 ms. Columns are accessed by name or by the index_* constants above, e.g. run[index_u_u_meas].
+runs = load_compact_runs(flashback_data.keys(), columns=columns_used, profiler=profiler)
 
 for key, value in flashback_data.items():
-    
-    hydrogen_percentage = key[0]
-    phi = key[1]
-    test_nr = key[2]
-    date = key[3]
-    
-    # Directory of data
-    data_dir = 'session_' + str(date) + '/'
-    
-    # A: File name of all data (except temperature)
-    filename_A =  data_dir + str(hydrogen_percentage) + '_phi=' + str(phi) + '_u1=x_' + str(date) + '_test' + str(test_nr) + '.txt'
-    
-    # Read data of experiment
-    data_A = pd.read_csv(filename_A, header=None)
-    flashback_data[key].append(data_A)
+    flashback_data[key].append(runs[key])
+
+#%% VALIDATION: AUTOMATIC FLASHBACK EVENT DETECTION
+profiler.switch('validation')
+# Set to True to compare the hand-annotated frame indices with the ones proposed by the detector
+validate_detection = False
+
+if validate_detection:
+    detected_frames = detect_session(flashback_data.keys())
+    detection_report = compare_with_annotations(detected_frames, flashback_data)
+    print(detection_report.groupby('event')['agrees'].mean())
+    print(detection_report[~detection_report['agrees']])
+
+#%% VALIDATION: DERIVED QUANTITIES
+profiler.switch('derived quantities')
+# Set to True to recompute phi, u_u, x_H2, the mass flows, power and rho_u of every row from the raw flows, T_u and p_u
+# with the formulas of the LabVIEW control panel (see CONSTANTS above) and list the runs where they differ from the log.
+# Corrected constants or columns can be passed as e.g. constants={'O2_in_air': 0.2095}, overrides={'x_CH4_set': 0.83}.
+check_derived_quantities = False
+
+if check_derived_quantities:
+    raw_runs = load_compact_runs(flashback_data.keys(), columns=RAW_COLUMNS + DERIVED_COLUMNS, profiler=profiler)
+    derived_report = check_derived(raw_runs)
+    print(derived_report.groupby('column')[['flagged', 'rows']].sum())
+    print(derived_report[derived_report['flagged'] > 0])
+    del raw_runs
 
 #%% RESULTS: PLOT CONFIGURATION
 # Directory to save figures
@@ -178,6 +143,7 @@ test_nr1_color = '#DB4437' # HEX color (google red: #DB4437)
 test_nr2_color = '#4285F4' # HEX color (google blue: #4285F4)
 test_nr3_color = '#0F9D58' # HEX color (google green: #0F9D58)
 test_nr4_color = '#F4B400' # HEX color (google yellow: #F4B400)
+test_nr_colors = {'1': test_nr1_color, '2': test_nr2_color, '3': test_nr3_color, '4': test_nr4_color}
 
 # Color for hydrogen content in plot
 H0_color = '#000000'
@@ -185,6 +151,7 @@ H25_color = '#4285F4'
 H50_color = '#DB4437'
 H75_color = '#F4B400'
 H100_color = '#0F9D58'
+H_colors = {'H0': H0_color, 'H25': H25_color, 'H50': H50_color, 'H75': H75_color, 'H100': H100_color}
 
 # Titles for plots
 H0_title = 'Hydrogen percentage = 0%'
@@ -192,365 +159,134 @@ H25_title = 'Hydrogen percentage = 25%'
 H50_title = 'Hydrogen percentage = 50%'
 H75_title = 'Hydrogen percentage = 75%'
 H100_title = 'Hydrogen percentage = 100%'
+H_titles = {'H0': H0_title, 'H25': H25_title, 'H50': H50_title, 'H75': H75_title, 'H100': H100_title}
 
-# Label settings for plot legends
-label_added_H0 = False
-label_added_H25 = False
-label_added_H50 = False
-label_added_H75 = False
-label_added_H100 = False
-
+# Labels for plot legends
 H0_label = 'H2% = 0'
 H25_label = 'H2% = 25'
 H50_label = 'H2% = 50'
 H75_label = 'H2% = 75'
 H100_label = 'H2% = 100'
+H_labels = {'H0': H0_label, 'H25': H25_label, 'H50': H50_label, 'H75': H75_label, 'H100': H100_label}
+
+# Axis limits [x_lim_left, x_lim_right, y_lim] of the plots per hydrogen content
+H_limits = {'H0': [0.50, 1.10, 2.00],
+            'H25': [0.40, 1.10, 3.50],
+            'H50': [0.40, 1.00, 4.50],
+            'H75': [0.30, 0.75, 7.00],
+            'H100': [0.25, 0.55, 9.00]}
 
 # Marker types
 design_point_marker = 'v'
 first_sign_FB_marker = '*'
 FB_marker = '^'
-legend_markers = [Line2D([0], [0], marker=design_point_marker, color='w', label='Design point (stable operation)', markerfacecolor='k', markersize=12),\
-                  Line2D([0], [0], marker=first_sign_FB_marker, color='w', label='First sign of FB', markerfacecolor='k', markersize=12),\
-                  Line2D([0], [0], marker=FB_marker, color='w', label='FB', markerfacecolor='k', markersize=12)]
-    
-#%% RESULTS: A
-for key, value in flashback_data.items():
-    
-    if key[0] == 'H0':
-        plt.figure(1)
-        x_lim_left = 0.50
-        x_lim_right = 1.10
-        y_lim = 2
-        fig_title = H0_title
-    elif key[0] =='H25':
-        plt.figure(2)
-        x_lim_left = 0.40
-        x_lim_right = 1.10
-        y_lim = 3.5
-        fig_title = H25_title
-    elif key[0] =='H50':
-        plt.figure(3)
-        x_lim_left = 0.40
-        x_lim_right = 1.00
-        y_lim = 4.5
-        fig_title = H50_title
-    elif key[0] =='H75':
-        plt.figure(4)
-        x_lim_left = 0.30
-        x_lim_right = 0.75
-        y_lim = 7.00
-        fig_title = H75_title
-    elif key[0] =='H100':
-        plt.figure(5)
-        x_lim_left = 0.25
-        x_lim_right = 0.55
-        y_lim = 9.00
-        fig_title = H100_title
-        
-    if key[2] == '1':
-        marker_color = test_nr1_color
-    elif key[2] == '2':
-        marker_color = test_nr2_color
-    elif key[2] == '3':
-        marker_color = test_nr3_color
-    elif key[2] == '4':
-        marker_color = test_nr4_color
-        
-    if value[index_u_u_design] == None and value[index_u_u_first_sign_FB] == None:
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_FB]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_FB]]
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-    elif value[index_u_u_design] == None:
-        phi_first_sign_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_first_sign_FB]]
-        u_u_first_sign_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_first_sign_FB]]
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_FB]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_FB]]
-        plt.plot(phi_first_sign_FB, u_u_first_sign_FB, color=marker_color, marker=first_sign_FB_marker)
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-    elif value[index_u_u_first_sign_FB] == None:
-        phi_design = flashback_data[key][index_data][index_phi_meas][value[index_u_u_design]]
-        u_u_design = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_design]]
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_FB]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_FB]]
-        plt.plot(phi_design, u_u_design, color=marker_color, marker=design_point_marker)
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-    else:
-        phi_design = flashback_data[key][index_data][index_phi_meas][value[index_u_u_design]]
-        u_u_design = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_design]]
-        phi_first_sign_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_first_sign_FB]]
-        u_u_first_sign_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_first_sign_FB]]
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index_u_u_FB]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index_u_u_FB]]
-        plt.plot(phi_design, u_u_design, color=marker_color, marker=design_point_marker)
-        plt.plot(phi_first_sign_FB, u_u_first_sign_FB, color=marker_color, marker=first_sign_FB_marker)
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-
-    plt.xlabel('$\phi$ [-]')
-    plt.ylabel('Unburned mixture bulk velocity $u_u$ [m/s]')
-    plt.xlim(x_lim_left, x_lim_right)
-    plt.ylim(0, y_lim)
-    plt.grid(b=True, which='major', color='#666666', linestyle='--', axis='both')
-    
-    plt.legend(handles=legend_markers)
-    plt.title(fig_title)
-
-#%% RESULTS: FLASHBACK PROPENSITY MAP FOR VARYING HYDROGEN CONTENT AND PHI at FB
-index = index_u_u_FB 
-    
-for key, value in flashback_data.items():
-    
-    plt.figure(6)
-    
-    if key[0] == 'H0':
-        label_added = label_added_H0
-        marker_color = H0_color
-        label_text = H0_label
-    elif key[0] == 'H25':
-        label_added = label_added_H25
-        marker_color = H25_color
-        label_text = H25_label
-    elif key[0] == 'H50':
-        label_added = label_added_H50
-        marker_color = H50_color
-        label_text = H50_label
-    elif key[0] == 'H75':
-        label_added = label_added_H75
-        marker_color = H75_color
-        label_text = H75_label
-    elif key[0] == 'H100':
-        label_added = label_added_H100
-        marker_color = H100_color
-        label_text = H100_label
-        
-    phi_FB = flashback_data[key][index_data][index_phi_meas][value[index]]
-    u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index]]
-        
-    if not label_added: 
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker='^', label=label_text )
-        if key[0] == 'H0':
-            label_added_H0 = True
-        elif key[0] == 'H25':
-            label_added_H25 = True
-        elif key[0] == 'H50':
-            label_added_H50 = True
-        elif key[0] == 'H75':
-            label_added_H75 = True
-        elif key[0] == 'H100':
-            label_added_H100 = True
-    else:
-        plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-    
-    plt.xlabel('$\phi$ [-]')
-    plt.ylabel('$u_{u,{FB}}$ [m/s]')
-    plt.xlim(0.25, 1.1)
-    plt.ylim(0, 9.00)
-    plt.grid(b=True, which='major', color='#666666', linestyle='--', axis='both')
-    plt.legend()
-    plt.title('Flashback propensity map for multiple mixtures')
-
-# Label settings for plot legends
-label_added_H0 = False
-label_added_H25 = False
-label_added_H50 = False
-label_added_H75 = False
-label_added_H100 = False
-
-# Save figure as .PNG
-figure_name = 'fb_map'
-plt.savefig(figure_folder +'/' + figure_name + '.png')
-#%% RESULTS: FLASHBACK PROPENSITY MAP FOR VARYING HYDROGEN CONTENT AND PHI at design point
-index = index_u_u_design 
-    
-for key, value in flashback_data.items():
-    
-    plt.figure(7)
-    
-    if not value[index] == None:
-        
-        if key[0] == 'H0':
-            label_added = label_added_H0
-            marker_color = H0_color
-            label_text = H0_label
-        elif key[0] == 'H25':
-            label_added = label_added_H25
-            marker_color = H25_color
-            label_text = H25_label
-        elif key[0] == 'H50':
-            label_added = label_added_H50
-            marker_color = H50_color
-            label_text = H50_label
-        elif key[0] == 'H75':
-            label_added = label_added_H75
-            marker_color = H75_color
-            label_text = H75_label
-        elif key[0] == 'H100':
-            label_added = label_added_H100
-            marker_color = H100_color
-            label_text = H100_label
-            
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index]]
-            
-        if not label_added: 
-            plt.plot(phi_FB, u_u_FB, color=marker_color, marker='^', label=label_text )
-            if key[0] == 'H0':
-                label_added_H0 = True
-            elif key[0] == 'H25':
-                label_added_H25 = True
-            elif key[0] == 'H50':
-                label_added_H50 = True
-            elif key[0] == 'H75':
-                label_added_H75 = True
-            elif key[0] == 'H100':
-                label_added_H100 = True
-        else:
-            plt.plot(phi_FB, u_u_FB, color=marker_color, marker=FB_marker)
-        
-        plt.xlabel('$\phi$ [-]')
-        plt.ylabel('$u_{u,{FB}}$ [m/s]')
-        plt.xlim(0.25, 1.1)
-        plt.ylim(0, 9.00)
-        plt.grid(b=True, which='major', color='#666666', linestyle='--', axis='both')
-        plt.legend()
-        plt.title('Flashback propensity map for multiple mixtures')
-        
-    elif value[index] == None:
-        pass
-    
-#%%RESULTS: THERMAL POWER OUTPUT FOR VARYING HYDROGEN CONTENT AND  PHI at FB
-# Intitalize variables (lists) to be plotted
-phi_FB_list = []
-u_u_FB_list = []
-p_thermal_list = []   
-index = index_u_u_FB  
-
-for key, value in flashback_data.items():
-    phi_FB = flashback_data[key][index_data][index_phi_meas][value[index]]
-    u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index]]
-    P_thermal_FB = flashback_data[key][index_data][index_P_thermal_meas][value[index]]
-    
-    phi_FB_list.append(phi_FB)
-    u_u_FB_list.append(u_u_FB)
-    p_thermal_list.append(P_thermal_FB)
-    
-plt.figure(8)  
-
-sc = plt.scatter(phi_FB_list, u_u_FB_list, c=p_thermal_list, cmap='coolwarm',vmin=0, vmax=20)
-cbar = plt.colorbar(sc)
-cbar.set_label('Thermal power output [kW]')
-
-plt.xlabel('$\phi$ [-]')
-plt.ylabel('$u_{u,{FB}}$ [m/s]')
-plt.xlim(0.25, 1.1)
-plt.ylim(0, 9.00)
-plt.grid(b=True, which='major', color='#666666', linestyle='-', axis='both')
-plt.title('Flashback propensity map for multiple mixtures')
-    
-#%%RESULTS: THERMAL POWER OUTPUT FOR VARYING HYDROGEN CONTENT AND  PHI at design point
-# Intitalize variables (lists) to be plotted
-phi_FB_list = []
-u_u_FB_list = []
-P_thermal_list = []   
-index = index_u_u_design 
-
-for key, value in flashback_data.items():
-    if not value[index] == None:
-        phi_FB = flashback_data[key][index_data][index_phi_meas][value[index]]
-        u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index]]
-        P_thermal_FB = flashback_data[key][index_data][index_P_thermal_meas][value[index]]
-        
-        phi_FB_list.append(phi_FB)
-        u_u_FB_list.append(u_u_FB)
-        P_thermal_list.append(P_thermal_FB)
-    elif value[index] == None:
-        pass
-    
-plt.figure(10)  
-
-sc = plt.scatter(phi_FB_list, u_u_FB_list, c=P_thermal_list, cmap='coolwarm',vmin=0, vmax=20)
-cbar = plt.colorbar(sc)
-cbar.set_label('Thermal power output [kW]')
-
-plt.xlabel('$\phi$ [-]')
-plt.ylabel('$u_{u,{FB}}$ [m/s]')
-plt.xlim(0.25, 1.1)
-plt.ylim(0, 9.00)
-plt.grid(b=True, which='major', color='#666666', linestyle='-', axis='both')
-plt.title('Flashback propensity map for multiple mixtures')
-
-#%%RESULTS: AIR FLOW 1 FOR VARYING HYDROGEN CONTENT AND  PHI at FB
-# Intitalize variables (lists) to be plotted
-phi_list = []
-u_u_list = []
-Q_air1_nL_per_min_meas_list = []   
-index = index_u_u_FB
-
-for key, value in flashback_data.items():
-    phi_FB = flashback_data[key][index_data][index_phi_meas][value[index]]
-    u_u_FB = flashback_data[key][index_data][index_u_u_meas][value[index]]
-    Q_air1_nL_per_min_meas_FB = flashback_data[key][index_data][index_Q_air1_nL_per_min_meas][value[index]]
-    
-    phi_list.append(phi_FB)
-    u_u_list.append(u_u_FB)
-    Q_air1_nL_per_min_meas_list.append(Q_air1_nL_per_min_meas_FB)
-    
-plt.figure(11)  
-
-sc = plt.scatter(phi_list, u_u_list, c=Q_air1_nL_per_min_meas_list, cmap='coolwarm',vmin=0, vmax=1000)
-cbar = plt.colorbar(sc)
-cbar.set_label('Air flow 1 [Ln/min]')
-
-plt.xlabel('$\phi$ [-]')
-plt.ylabel('$u_{u,{FB}}$ [m/s]')
-plt.xlim(0.25, 1.1)
-plt.ylim(0, 9.00)
-plt.grid(b=True, which='major', color='#666666', linestyle='-', axis='both')
-plt.title('Flashback propensity map for multiple mixtures')
-      
-#%% RESULTS: PLOT SPECIFIC VARIABLE IN TIME DURING EXPERIMENT
-plt.figure(12) 
-
-experiment = ('H100', '0.35', '1', '2020-07-29')      
-key = experiment     
-t = flashback_data[key][index_data][index_time]
-y1 = flashback_data[key][index_data][index_Q_air1_nL_per_min_meas]
-y2 = flashback_data[key][index_data][index_Q_H2_nL_per_min_meas] 
-y3 = flashback_data[key][index_data][index_Q_DNG_nL_per_min_meas] 
-plt.plot(t, y1, label='Q_air')   
-plt.plot(t, y2, label='Q_H2')   
-plt.plot(t, y3, label='Q_DNG')   
-plt.xlim(0, len(t))
-plt.xticks(np.array([0, len(t)-1]))    
-plt.legend()    
-
-#%% RESULTS: PLOT SPECIFIC VARIABLE IN TIME DURING EXPERIMENT
-plt.figure(13) 
-
-plt.plot(t, y1/y2, label='Q_air/Q_H2')   
-plt.xlim(0, len(t))
-plt.xticks(np.array([0, len(t)-1]))    
-plt.legend()        
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-
-
-
+event_markers = {'design': design_point_marker, 'first_sign_FB': first_sign_FB_marker, 'FB': FB_marker}
+
+#%% RESULTS: EVENT TABLE
+profiler.switch('event table')
+# One row per (hydrogen content, phi, test nr, date, event) with the measured values at the frame index of the event
+event_table = build_event_table(flashback_data, runs, columns=['phi_meas', 'u_u_meas', 'power_meas', 'Q_a1_meas',
+                                                                 'x_H2_meas', 'T_u_ambient', 'p_u_ambient'])
+
+# Laminar flame speed S_L of every event, interpolated in the precomputed table (physics/flame_tools/lookup.py).
+# The table is filled (resumable) in the physics folder with: python -m flame_tools.fill_table flame_speed_table.npz
+flame_speed_table_file = '../../physics/flame_speed_table.npz'
+
+flame_speed_table = FlameSpeedTable.open(flame_speed_table_file)
+
+operating_points = [event_table[column] for column in ['x_H2_meas', 'phi_meas', 'T_u_ambient', 'p_u_ambient']]
+event_table['S_L'] = flame_speed_table.interpolate(*operating_points)
+event_table['u_u_S_L'] = event_table['u_u_meas']/event_table['S_L']
+outside_grid = flame_speed_table.outside(*operating_points)
+if outside_grid.any():
+    print('Warning: {} events lie outside the grid of the flame speed table, extend DEFAULT_GRID:'.format(outside_grid.sum()))
+    print(event_table.loc[outside_grid, ['x_H2_meas', 'phi_meas', 'T_u_ambient', 'p_u_ambient']])
+missing_S_L = event_table['S_L'].isna() & ~outside_grid
+if missing_S_L.any():
+    print('Warning: no laminar flame speed for {} of {} events (table not filled yet, fill it with '
+          'python -m flame_tools.fill_table), their u_u/S_L is NaN'.format(missing_S_L.sum(), len(event_table)))
+profiler.add_rows(len(event_table))
+FB_events = event_table.xs('FB', level='event', drop_level=False)
+
+# Mean, standard deviation and percentiles of the measured columns in the window of frames before every event,
+# pooled over the repeated tests per (hydrogen content, phi, event) and drawn as error bars on the FB maps
+event_window = 25   # frames, about 5 s
+window_table = window_statistics(flashback_data, runs, columns=['phi_meas', 'u_u_meas', 'power_meas', 'Q_a1_meas'],
+                                 window=event_window)
+pooled_events = pool_repeats(window_table)
+
+#%%RESULTS: FB VELOCITY OVER LAMINAR FLAME SPEED FOR VARYING HYDROGEN CONTENT AND PHI at FB
+profiler.switch('u_u/S_L FB')
+# u_u/S_L at FB per mixture (mean, standard deviation and number of tests), printed when the flame speed table
+# covers the FB events (figure fb_map_u_u_S_L below)
+FB_u_u_S_L = FB_events.groupby(level=['hydrogen_percentage', 'phi'], sort=False)['u_u_S_L'].agg(['mean', 'std', 'count'])
+
+if FB_events['u_u_S_L'].notna().any():
+    print(FB_u_u_S_L)
+
+#%% RESULTS: DATA OF THE TIME SERIES AND THERMOCOUPLE FIGURES
+profiler.switch('time series')
+# Run shown in the time series of the flows and of the thermocouples
+experiment = ('H100', '0.35', '1', '2020-07-29')
+time_series = load_run(experiment, ['time', 'Q_a1_meas', 'Q_H2_meas', 'Q_DNG_meas'])
+
+data_tc = load_run(experiment, thermocouple=True)
+t_tc = (run_time_ms(experiment, thermocouple=True) - run_time_ms(experiment)[0])/1000
+thermocouples = data_tc[tc_variables_list[1:]].assign(time_s=t_tc)
+
+#%% RESULTS: UNCERTAINTY OF PHI AND U_U FROM THE FLOW METERS
+profiler.switch('flow uncertainty')
+# Set to True to propagate the errors of the flow meters (FLOW_METER_SPECS in flashback_tools/uncertainty.py) to phi and
+# u_u at the FB events with a Monte Carlo simulation and draw the 95% confidence ellipses on the FB map
+propagate_flow_uncertainty = False
+n_flow_samples = 4000
+FB_ellipses = None
+
+if propagate_flow_uncertainty:
+    FB_raw = build_event_table(flashback_data, columns=RAW_COLUMNS).xs('FB', level='event', drop_level=False)
+    FB_ellipses = confidence_ellipses(monte_carlo_events(FB_raw, n_flow_samples, chunk_size=1000), confidence=0.95)
+
+#%% RESULTS: FIGURES
+profiler.switch('figures')
+# Every figure of the report is a job of flashback_tools/rendering.py (builder, data slice and plot settings):
+# - u_u_phi_H0 ... u_u_phi_H100: operating points per hydrogen content, colored by test nr
+# - fb_map, fb_map_design: flashback propensity map at FB and at the design point, colored by hydrogen content,
+#   with the error bars of the repeated tests
+# - fb_map_u_u_S_L: FB velocity over laminar flame speed (when the flame speed table covers the FB events)
+# - fb_map_power, fb_map_power_design, fb_map_air_flow_1: FB maps colored by thermal power and air flow 1
+# - flows_time, air_H2_ratio_time, thermocouples_time: time series of the experiment above
+# - fb_map_uncertainty: FB map with the confidence ellipses (with propagate_flow_uncertainty)
+plot_settings = {'test_nr_colors': test_nr_colors, 'H_colors': H_colors, 'H_titles': H_titles, 'H_labels': H_labels,
+                 'H_limits': H_limits, 'event_markers': event_markers}
+figure_jobs = report_jobs(event_table, time_series, plot_settings, pooled=pooled_events, thermocouples=thermocouples,
+                          ellipses=FB_ellipses)
+
+# Draw them as pyplot figures, labelled with the job names
+figures = show_figures(figure_jobs)
+
+#%% RESULTS: WRITE ALL FIGURES
+profiler.switch('write figures')
+# Render all figures headless (Agg backend) in a thread pool and save them in the figure folder.
+# Figures whose data and plot settings did not change since the previous run are skipped.
+rendered_figures = render_figures(figure_jobs, figure_folder)
+print('Rendered figures: ' + ', '.join(rendered_figures))
+
+#%% PROFILE REPORT
+# Report of the stages (JSON) and folded stacks for flamegraph.pl or speedscope in the figure folder
+profiler.stop_all()
+
+if profile_stages:
+    profiler.save_json(os.path.join(figure_folder, 'profile_report.json'))
+    profiler.save_folded(os.path.join(figure_folder, 'profile_report.folded'))
+    print(profiler.summary())
+
+#%% LIVE: FOLLOW A SESSION WHILE IT IS BEING RECORDED
+# Set to the directory of the running session (e.g. 'session_2020-07-31') to follow its growing log files
+# and keep the latest operating point of every run up to date on live FB maps (figures 6 and 8), in place of the
+# fb_map and fb_map_power figures
+live_session_dir = None
+
+if live_session_dir is not None:
+    plt.close('fb_map')
+    plt.close('fb_map_power')
+    live_watcher = watch_session(live_session_dir, H_colors, interval=0.2)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for post-processing the flashback experiments in phd_data.
+
+The post-processing scripts live next to the data of each liner set and add
+this folder to ``sys.path`` (``sys.path.append('..')``) before importing.
+"""
+
+from flashback_tools.session_cache import read_session_file, load_column, time_to_ms
+from flashback_tools.columns import variables_list, tc_variables_list, column_index
+from flashback_tools.loader import run_filename, load_run, load_runs
+from flashback_tools.frame_index import get_frames
+from flashback_tools.thermocouple import load_aligned_run, load_aligned_runs, run_time_ms
+from flashback_tools.run_table import build_event_table, scatter_groups
+from flashback_tools.detection import detect_events, detect_session, compare_with_annotations
+from flashback_tools.live import SessionWatcher, LiveFlashbackMap, watch_session
+from flashback_tools.rendering import FigureJob, render_figures, report_jobs, show_figures
+from flashback_tools.decimation import minmax_decimate, lttb_decimate, plot_decimated
+from flashback_tools.synthetic import generate_liner_set
+from flashback_tools.profiling import Profiler
+from flashback_tools.compact import CompactRun, load_compact_run, load_compact_runs
+from flashback_tools.catalog import Catalog, read_annotations, write_annotations
+from flashback_tools.derived import RAW_COLUMNS, DERIVED_COLUMNS, derive_quantities, derive_runs, check_derived
+from flashback_tools.event_windows import window_statistics, pool_repeats, pooled_errorbars
+from flashback_tools.uncertainty import FLOW_METER_SPECS, monte_carlo_events, confidence_ellipses, plot_ellipses
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Batch processing of a campaign of liner sets.
+
+Every liner set folder (with ``session_*`` directories and an
+``annotations.csv``, see catalog) is processed by its own worker process:
+the used columns of the annotated runs are loaded as compact runs, reduced
+to the event table and the pooled window statistics (see event_windows),
+the report figures are rendered to ``<liner set>/figures/batch`` and the
+two tables are written there as ``event_table.csv`` and
+``pooled_events.csv``. The folder is separate from the ``figures`` of the
+post-processing script, whose event table has more columns (S_L), so
+neither overwrites the other's figures, tables or render cache.
+The runs are released when the worker returns, so at most one liner set per
+worker is in memory and a campaign takes about as long as its slowest set.
+
+The combined FB maps, comparing the liner sets, are drawn from the per-set
+tables alone. Run from phd_data with e.g.
+
+    python -m flashback_tools.batch "Steel liner set 1" "Steel liner set 2" --output campaign
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from flashback_tools.catalog import Catalog
+from flashback_tools.compact import load_compact_runs
+from flashback_tools.event_windows import EVENT_WINDOW, pool_repeats, window_statistics
+from flashback_tools.loader import load_run
+from flashback_tools.rendering import FigureJob, build_campaign_map, render_figures, report_jobs
+from flashback_tools.run_table import INDEX_NAMES, build_event_table
+
+# Columns of the per-set event tables
+BATCH_COLUMNS = ['phi_meas', 'u_u_meas', 'power_meas', 'Q_a1_meas', 'x_H2_meas', 'T_u_ambient', 'p_u_ambient']
+
+# Plot settings of the post-processing scripts
+H_COLORS = {'H0': '#000000', 'H25': '#4285F4', 'H50': '#DB4437', 'H75': '#F4B400', 'H100': '#0F9D58'}
+H_LIMITS = {'H0': [0.50, 1.10, 2.00], 'H25': [0.40, 1.10, 3.50], 'H50': [0.40, 1.00, 4.50],
+            'H75': [0.30, 0.75, 7.00], 'H100': [0.25, 0.55, 9.00]}
+TEST_NR_COLORS = ['#DB4437', '#4285F4', '#0F9D58', '#F4B400', '#000000']
+EVENT_MARKERS = {'design': 'v', 'first_sign_FB': '*', 'FB': '^'}
+
+# Markers of the liner sets on the combined FB maps
+LINER_SET_MARKERS = ['^', 'o', 's', 'D', 'P', 'X', 'v', '*']
+
+# Output folder of a liner set, relative to its folder
+BATCH_FOLDER = os.path.join('figures', 'batch')
+EVENT_TABLE_FILE = 'event_table.csv'
+POOLED_FILE = 'pooled_events.csv'
+
+
+def _H_colors(H_values):
+    H_values = sorted(H_values, key=lambda H: int(H.lstrip('H')))
+    return {H: H_COLORS.get(H, TEST_NR_COLORS[i % len(TEST_NR_COLORS)]) for i, H in enumerate(H_values)}
+
+
+def liner_set_plot_settings(keys):
+    """Plot settings of report_jobs for the runs of a liner set."""
+    test_nrs = sorted({key[2] for key in keys}, key=int)
+    H_values = sorted({key[0] for key in keys}, key=lambda H: int(H.lstrip('H')))
+    return {'test_nr_colors': {test_nr: TEST_NR_COLORS[i % len(TEST_NR_COLORS)] for i, test_nr in enumerate(test_nrs)},
+            'H_colors': _H_colors(H_values),
+            'H_titles': {H: 'Hydrogen percentage = ' + H.lstrip('H') + '%' for H in H_values},
+            'H_labels': {H: 'H2% = ' + H.lstrip('H') for H in H_values},
+            'H_limits': {H: H_LIMITS.get(H, [0.25, 1.10, 9.00]) for H in H_values},
+            'event_markers': EVENT_MARKERS}
+
+
+def liner_set_labels(folders):
+    """
+    Labels of liner set folders: their paths relative to the common root,
+    so equally named folders in different places stay apart.
+    """
+    paths = [os.path.abspath(folder) for folder in folders]
+    if len(set(paths)) < 2:
+        return [os.path.basename(path) for path in paths]
+    root = os.path.commonpath(paths)
+    return [os.path.relpath(path, root).replace(os.sep, '/') for path in paths]
+
+
+def process_liner_set(folder, figure_folder=None, window=EVENT_WINDOW, label=None):
+    """
+    Event table, pooled window statistics and report figures of one liner
+    set, written to `figure_folder` (default ``<folder>/figures/batch``, see
+    BATCH_FOLDER). Returns a summary dict with the liner set (`label`, by
+    default the folder name), the numbers of runs and events, the paths of
+    the two tables and the run time. A liner set without annotated runs is not
+    processed, its tables are None.
+    """
+    start = time.perf_counter()
+    liner_set = os.path.basename(os.path.abspath(folder)) if label is None else label
+    catalog = Catalog.open(folder)
+    flashback_data = catalog.flashback_data()
+    keys = list(flashback_data)
+    if not keys:
+        return {'liner_set': liner_set, 'folder': folder, 'runs': 0, 'events': 0, 'event_table': None,
+                'pooled': None, 'wall_s': time.perf_counter() - start}
+
+    figure_folder = os.path.join(folder, BATCH_FOLDER) if figure_folder is None else figure_folder
+    os.makedirs(figure_folder, exist_ok=True)
+    runs = load_compact_runs(keys, columns=BATCH_COLUMNS, data_folder=folder)
+    event_table = build_event_table(flashback_data, runs, columns=BATCH_COLUMNS)
+    pooled = pool_repeats(window_statistics(flashback_data, runs, columns=['phi_meas', 'u_u_meas'], window=window))
+    del runs
+
+    time_series = load_run(keys[0], ['time', 'Q_a1_meas', 'Q_H2_meas', 'Q_DNG_meas'], folder)
+    jobs = report_jobs(event_table, time_series, liner_set_plot_settings(keys), pooled=pooled)
+    render_figures(jobs, figure_folder, use_processes=False)
+
+    event_table_file = os.path.join(figure_folder, EVENT_TABLE_FILE)
+    pooled_file = os.path.join(figure_folder, POOLED_FILE)
+    event_table.to_csv(event_table_file)
+    pooled.to_csv(pooled_file)
+    return {'liner_set': liner_set, 'folder': folder, 'runs': len(keys),
+            'events': len(event_table), 'event_table': event_table_file, 'pooled': pooled_file,
+            'wall_s': time.perf_counter() - start}
+
+
+def read_event_tables(summaries):
+    """
+    Event tables and pooled tables of processed liner sets, concatenated with
+    the liner set as first index level. Skipped liner sets are left out.
+    """
+    index_dtypes = {name: str for name in INDEX_NAMES}
+    event_tables, pooled_tables = [], []
+    for summary in summaries:
+        if summary['event_table'] is None:
+            continue
+        event_table = pd.read_csv(summary['event_table'], dtype=index_dtypes).set_index(INDEX_NAMES)
+        pooled = pd.read_csv(summary['pooled'], dtype=index_dtypes).set_index(['hydrogen_percentage', 'phi', 'event'])
+        event_tables.append(pd.concat({summary['liner_set']: event_table}, names=['liner_set']))
+        pooled_tables.append(pd.concat({summary['liner_set']: pooled}, names=['liner_set']))
+    return pd.concat(event_tables), pd.concat(pooled_tables)
+
+
+def campaign_jobs(event_tables, pooled_tables):
+    """Figure jobs of the combined FB maps at FB and at the design point."""
+    liner_sets = list(dict.fromkeys(event_tables.index.get_level_values('liner_set')))
+    colors = _H_colors(set(event_tables.index.get_level_values('hydrogen_percentage')))
+    settings = {'xlabel': '$\\phi$ [-]', 'ylabel': '$u_{u,{FB}}$ [m/s]', 'xlim': [0.25, 1.1], 'ylim': [0, 9.00],
+                'H_colors': colors, 'figsize': (8.0, 6.0),
+                'liner_set_markers': {liner_set: LINER_SET_MARKERS[i % len(LINER_SET_MARKERS)]
+                                      for i, liner_set in enumerate(liner_sets)}}
+
+    jobs = []
+    for event, name, title in [('FB', 'campaign_fb_map', 'Flashback propensity map per liner set'),
+                               ('design', 'campaign_fb_map_design', 'Design points per liner set')]:
+        data = {'events': event_tables.xs(event, level='event', drop_level=False),
+                'pooled': pooled_tables.xs(event, level='event', drop_level=False)}
+        jobs.append(FigureJob(name, build_campaign_map, data, dict(settings, title=title)))
+    return jobs
+
+
+def process_liner_sets(folders, output_folder='campaign', max_workers=None, window=EVENT_WINDOW):
+    """
+    Process liner set folders concurrently, one worker process per set (at
+    most `max_workers`, by default the number of CPUs), and draw the
+    combined FB maps in `output_folder`. The liner sets are labelled by
+    liner_set_labels. Liner sets without annotated runs
+    are skipped with a message. Like every process pool this needs the ``if
+    __name__ == '__main__':`` guard in the calling script. Returns the
+    summaries of the liner sets.
+    """
+    folders = list(folders)
+    if max_workers is None:
+        max_workers = min(len(folders), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_liner_set, folder, None, window, label)
+                   for folder, label in zip(folders, liner_set_labels(folders))]
+        summaries = [future.result() for future in futures]
+
+    for summary in summaries:
+        if summary['event_table'] is None:
+            print('Skipping liner set {}: no annotated runs in {}'.format(summary['liner_set'], summary['folder']))
+    if all(summary['event_table'] is None for summary in summaries):
+        return summaries
+
+    event_tables, pooled_tables = read_event_tables(summaries)
+    render_figures(campaign_jobs(event_tables, pooled_tables), output_folder, use_processes=False)
+    event_tables.to_csv(os.path.join(output_folder, EVENT_TABLE_FILE))
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folders', nargs='+', help='liner set folders')
+    parser.add_argument('--output', default='campaign', help='folder of the combined FB maps')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per liner set)')
+    parser.add_argument('--window', type=int, default=EVENT_WINDOW, help='frames before the events for the error bars')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summaries = process_liner_sets(args.folders, args.output, args.workers, args.window)
+    width = max(len(summary['liner_set']) for summary in summaries)
+    for summary in summaries:
+        print('{:<{}} {:5d} runs {:6d} events {:8.2f} s'.format(summary['liner_set'], width, summary['runs'],
+                                                                summary['events'], summary['wall_s']))
+    print('Campaign of {} liner sets in {:.2f} s'.format(len(summaries), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
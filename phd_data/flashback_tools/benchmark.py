@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the post-processing pipeline on synthetic liner sets.
+
+For every scale (number of runs) a synthetic liner set is generated in a
+temporary folder (see synthetic) and the stages of the post-processing
+script are timed and memory profiled:
+
+- load_parse: load the used columns of all runs, parsing the text files and
+  building the columnar cache;
+- load_cached: the same load from the cache;
+- extract: the event table with the operating points at the events;
+- build_figures: the figures of the report (without saving);
+- save_png: render all figures to PNG files.
+
+Per stage the wall time, CPU time of this process, peak of the traced Python
+and NumPy allocations (tracemalloc), the maximum resident set size and the
+rows processed are recorded with a Profiler (see profiling), together with
+the runs that took longest to load. The results are written as JSON, so runs on different commits or
+machines can be compared. Run from phd_data with e.g.
+
+    python -m flashback_tools.benchmark --runs 121 1210 --rows 2000 --output benchmark.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib
+
+from flashback_tools.loader import load_run, load_runs
+from flashback_tools.profiling import Profiler
+from flashback_tools.rendering import render_figures, report_jobs
+from flashback_tools.run_table import build_event_table
+from flashback_tools.synthetic import SYNTHETIC_PHI, generate_liner_set
+
+# Columns loaded by the post-processing script
+BENCHMARK_COLUMNS = ['time', 'phi_meas', 'u_u_meas', 'Q_a1_meas', 'Q_DNG_meas', 'Q_H2_meas', 'power_meas']
+
+COLORS = ['#DB4437', '#4285F4', '#0F9D58', '#F4B400', '#000000']
+
+
+def benchmark_plot_settings(keys):
+    """Plot settings of report_jobs for the runs of a synthetic liner set."""
+    test_nrs = sorted({key[2] for key in keys}, key=int)
+    H_values = list(SYNTHETIC_PHI)
+    return {'test_nr_colors': {test_nr: COLORS[i % len(COLORS)] for i, test_nr in enumerate(test_nrs)},
+            'H_colors': {H: COLORS[i % len(COLORS)] for i, H in enumerate(H_values)},
+            'H_titles': {H: 'Hydrogen percentage = ' + H.lstrip('H') + '%' for H in H_values},
+            'H_labels': {H: 'H2% = ' + H.lstrip('H') for H in H_values},
+            'H_limits': {H: [0.25, 1.10, 9.00] for H in H_values},
+            'event_markers': {'design': 'v', 'first_sign_FB': '*', 'FB': '^'}}
+
+
+def _build_figures(jobs):
+    return [job.builder(job.data, job.settings) for job in jobs]
+
+
+def benchmark_pipeline(data_folder, flashback_data, figure_folder, max_workers=None):
+    """
+    Measurements of all stages of the pipeline on one liner set: the stage
+    records of a Profiler and the ten runs that took longest to load.
+    """
+    keys = list(flashback_data)
+    profiler = Profiler()
+
+    with profiler.stage('load_parse'):
+        runs = load_runs(keys, BENCHMARK_COLUMNS, data_folder, max_workers=max_workers, profiler=profiler)
+    del runs
+    with profiler.stage('load_cached'):
+        runs = load_runs(keys, BENCHMARK_COLUMNS, data_folder, max_workers=max_workers, profiler=profiler)
+
+    with profiler.stage('extract'):
+        event_table = build_event_table(flashback_data, runs)
+        profiler.add_rows(len(event_table))
+
+    time_series = load_run(keys[0], ['time', 'Q_a1_meas', 'Q_H2_meas', 'Q_DNG_meas'], data_folder)
+    jobs = report_jobs(event_table, time_series, benchmark_plot_settings(keys))
+    with profiler.stage('build_figures'):
+        _build_figures(jobs)
+    with profiler.stage('save_png'):
+        render_figures(jobs, figure_folder, max_workers=max_workers, use_processes=True, force=True)
+
+    report = profiler.report()
+    return {'stages': report['stages'], 'slowest_keys': report['keys'][:10]}
+
+
+def run_benchmarks(scales, n_rows=2000, max_workers=None, seed=0, work_folder=None, keep_data=False):
+    """
+    Generate a synthetic liner set per number of runs in `scales` and
+    benchmark the pipeline on it. Returns the report as a dict.
+    """
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                              'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                              'matplotlib': matplotlib.__version__},
+              'parameters': {'scales': list(scales), 'rows_per_run': n_rows, 'max_workers': max_workers, 'seed': seed},
+              'results': []}
+
+    for n_runs in scales:
+        data_folder = tempfile.mkdtemp(prefix='synthetic_liner_set_', dir=work_folder)
+        try:
+            start = time.perf_counter()
+            flashback_data = generate_liner_set(data_folder, n_runs, n_rows, seed=seed)
+            generate_s = time.perf_counter() - start
+            result = benchmark_pipeline(data_folder, flashback_data, os.path.join(data_folder, 'figures'), max_workers)
+            report['results'].append(dict(result, runs=n_runs, generate_s=generate_s))
+        finally:
+            if not keep_data:
+                shutil.rmtree(data_folder, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, nargs='+', default=[121], help='number of runs per scale')
+    parser.add_argument('--rows', type=int, default=2000, help='rows per run')
+    parser.add_argument('--workers', type=int, default=None, help='workers of the load and render pools')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-folder', default=None, help='folder for the synthetic data (default: system temp)')
+    parser.add_argument('--keep-data', action='store_true', help='keep the synthetic liner sets')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file with the results')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.runs, args.rows, args.workers, args.seed, args.work_folder, args.keep_data)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    for result in report['results']:
+        for stage in result['stages']:
+            print('{:>6} runs  {:<14} {:8.2f} s wall  {:8.2f} s cpu  {:8.1f} MB peak  {:10d} rows'.format(
+                result['runs'], stage['stage'], stage['wall_s'], stage['cpu_s'], stage['peak_traced_bytes']/1e6,
+                stage['rows']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Catalog of the runs of one or more liner sets, derived from the file names.
+
+``Catalog.open`` scans the ``session_*`` directories of a liner set folder for
+``H{pct}_phi={phi}_u1=x_{date}_test{n}[_tc].txt`` files and keeps an index
+in ``.catalog.json`` in that folder with per run the file names, sizes, row
+counts and the first and last time stamp. Runs with an empty main log are
+skipped with a warning. Files whose size and modification
+time did not change are not opened again. The event frame indices that used
+to be typed into ``flashback_data`` in the script are kept in the sidecar
+file ``annotations.csv`` next to the sessions and merged into the catalog.
+
+``select`` filters the runs on hydrogen percentage, phi (value or range),
+date, test nr, liner set and whether they are annotated, from the index
+only, before any data is loaded.
+"""
+
+import glob
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.loader import parse_run_filename
+from flashback_tools.run_table import EVENT_TYPES
+from flashback_tools.session_cache import TIME_STAMP_LENGTH, time_to_ms
+from flashback_tools.thermocouple import DAY_MS
+
+# Index of the runs, in the liner set folder
+CATALOG_INDEX = '.catalog.json'
+
+# Bump when the layout of the index changes, old indices are then rebuilt
+CATALOG_VERSION = 1
+
+# Sidecar file with the event frame indices of the runs, in the liner set folder
+ANNOTATION_FILE = 'annotations.csv'
+
+KEY_NAMES = ['hydrogen_percentage', 'phi', 'test_nr', 'date']
+
+
+def _file_summary(filename, block_size=1 << 20):
+    # Size, modification time, row count and first/last time stamp [ms] of a log file
+    stat = os.stat(filename)
+    if stat.st_size == 0:
+        return {'size': 0, 'mtime_ns': stat.st_mtime_ns, 'n_rows': 0, 'start_ms': None, 'end_ms': None}
+    n_rows = 0
+    with open(filename, 'rb') as f:
+        first = f.readline()
+        f.seek(0)
+        for block in iter(lambda: f.read(block_size), b''):
+            n_rows += block.count(b'\n')
+            last_block = block
+        end = last_block.rstrip(b'\n')
+        last = end[end.rfind(b'\n') + 1:]
+    if not last_block.endswith(b'\n'):
+        n_rows += 1
+
+    start_ms, end_ms = time_to_ms([first[:TIME_STAMP_LENGTH], last[:TIME_STAMP_LENGTH]])
+    if end_ms < start_ms:
+        # The run went past midnight
+        end_ms += DAY_MS
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'n_rows': n_rows,
+            'start_ms': int(start_ms), 'end_ms': int(end_ms)}
+
+
+def _read_index(folder):
+    index_file = os.path.join(folder, CATALOG_INDEX)
+    if not os.path.isfile(index_file):
+        return {}
+    with open(index_file) as f:
+        index = json.load(f)
+    if index.get('version') != CATALOG_VERSION:
+        return {}
+    return index['files']
+
+
+def _write_index(folder, files):
+    index_file = os.path.join(folder, CATALOG_INDEX)
+    with open(index_file + '.tmp', 'w') as f:
+        json.dump({'version': CATALOG_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(index_file + '.tmp', index_file)
+
+
+def scan_liner_set(folder):
+    """
+    Index the log files of a liner set folder, opening only new or changed
+    files. Returns a dict relative file name -> file summary.
+    """
+    old_files = _read_index(folder)
+    files = {}
+    for filename in sorted(glob.glob(os.path.join(folder, 'session_*', 'H*_phi=*_test*.txt'))):
+        if parse_run_filename(filename) is None:
+            continue
+        name = os.path.relpath(filename, folder).replace(os.sep, '/')
+        stat = os.stat(filename)
+        entry = old_files.get(name)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            entry = _file_summary(filename)
+        files[name] = entry
+
+    if files != old_files:
+        _write_index(folder, files)
+    return files
+
+
+def read_annotations(folder):
+    """Event frame indices of the annotation file of a liner set: dict run key -> [design, first sign of FB, FB]."""
+    annotation_file = os.path.join(folder, ANNOTATION_FILE)
+    if not os.path.isfile(annotation_file):
+        return {}
+    table = pd.read_csv(annotation_file, dtype={name: str for name in KEY_NAMES}, comment='#')
+    annotations = {}
+    for row in table.itertuples(index=False):
+        key = tuple(getattr(row, name) for name in KEY_NAMES)
+        annotations[key] = [None if pd.isna(getattr(row, event)) else int(getattr(row, event)) for event in EVENT_TYPES]
+    return annotations
+
+
+def write_annotations(folder, flashback_data):
+    """Write event frame indices (dict run key -> [design, first sign of FB, FB]) to the annotation file."""
+    rows = [list(key[:4]) + list(value[:len(EVENT_TYPES)]) for key, value in flashback_data.items()]
+    table = pd.DataFrame(rows, columns=KEY_NAMES + EVENT_TYPES)
+    for event in EVENT_TYPES:
+        table[event] = table[event].astype('Int64')
+    table.to_csv(os.path.join(folder, ANNOTATION_FILE), index=False)
+
+
+class Catalog:
+    """
+    Table of runs, one row per run key with its liner set, data folder, file
+    summaries of the main and thermocouple log and the event frame indices.
+    """
+
+    def __init__(self, runs):
+        self.runs = runs
+
+    @classmethod
+    def open(cls, folders='.'):
+        """Catalog of one or more liner set folders, refreshing their indices."""
+        if isinstance(folders, str):
+            folders = [folders]
+        rows = []
+        for folder in folders:
+            liner_set = os.path.basename(os.path.abspath(folder))
+            files = scan_liner_set(folder)
+            annotations = read_annotations(folder)
+
+            runs = {}
+            for name, summary in files.items():
+                key, is_tc = parse_run_filename(name)
+                run = runs.setdefault(key, {'liner_set': liner_set, 'data_folder': folder})
+                prefix = 'tc_' if is_tc else ''
+                run[prefix + 'file'] = name
+                run.update({prefix + field: value for field, value in summary.items() if field != 'mtime_ns'})
+
+            for key, run in runs.items():
+                if 'file' not in run:
+                    # A thermocouple log without a main log is not a run
+                    continue
+                if run['n_rows'] == 0:
+                    warnings.warn('Skipping run %s of %s, its log %s is empty' % (key, liner_set, run['file']))
+                    continue
+                events = annotations.get(key, [None]*len(EVENT_TYPES))
+                rows.append(dict(zip(KEY_NAMES, key), **run, **dict(zip(EVENT_TYPES, events))))
+
+        columns = KEY_NAMES + ['liner_set', 'data_folder', 'file', 'size', 'n_rows', 'start_ms', 'end_ms',
+                               'tc_file', 'tc_size', 'tc_n_rows', 'tc_start_ms', 'tc_end_ms'] + EVENT_TYPES
+        runs = pd.DataFrame(rows, columns=columns)
+        for event in EVENT_TYPES:
+            runs[event] = runs[event].astype('Int64')
+        runs['H2'] = runs['hydrogen_percentage'].str.lstrip('H').astype(int)
+        runs['phi_value'] = runs['phi'].astype(float)
+        runs['test'] = runs['test_nr'].astype(int)
+        runs['duration_s'] = (runs['end_ms'] - runs['start_ms'])/1000
+        runs['annotated'] = runs[EVENT_TYPES].notna().any(axis=1)
+        runs = runs.sort_values(['liner_set', 'H2', 'phi_value', 'test', 'date'], kind='stable')
+        return cls(runs.drop(columns='test').reset_index(drop=True))
+
+    def __len__(self):
+        return len(self.runs)
+
+    def select(self, hydrogen_percentage=None, phi=None, date=None, test_nr=None, liner_set=None, annotated=None):
+        """
+        Subset of the catalog. Every argument is a value or a list of values;
+        `hydrogen_percentage` can also be given as numbers (0, 25, ...) and
+        `phi` as a (min, max) range.
+        """
+        mask = np.ones(len(self.runs), dtype=bool)
+        if hydrogen_percentage is not None:
+            values = hydrogen_percentage if isinstance(hydrogen_percentage, (list, tuple, set)) else [hydrogen_percentage]
+            values = [int(str(value).lstrip('H')) for value in values]
+            mask &= self.runs['H2'].isin(values).to_numpy()
+        if phi is not None:
+            if isinstance(phi, tuple) and len(phi) == 2:
+                mask &= self.runs['phi_value'].between(float(phi[0]), float(phi[1])).to_numpy()
+            else:
+                values = phi if isinstance(phi, (list, set)) else [phi]
+                mask &= np.isin(self.runs['phi_value'].to_numpy(), [float(value) for value in values])
+        for column, value in (('date', date), ('test_nr', test_nr), ('liner_set', liner_set)):
+            if value is not None:
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                mask &= self.runs[column].isin([str(value) for value in values]).to_numpy()
+        if annotated is not None:
+            mask &= (self.runs['annotated'] == annotated).to_numpy()
+        return Catalog(self.runs[mask].reset_index(drop=True))
+
+    def keys(self):
+        """Run keys (hydrogen percentage, phi, test nr, date) of the catalog."""
+        return list(self.runs[KEY_NAMES].itertuples(index=False, name=None))
+
+    def flashback_data(self):
+        """
+        The annotated runs as in the scripts: dict run key -> [frame index
+        design point, first sign of FB, FB] (None if not annotated).
+        """
+        runs = self.runs[self.runs['annotated']]
+        return {tuple(row[:4]): [None if pd.isna(frame) else int(frame) for frame in row[4:]]
+                for row in runs[KEY_NAMES + EVENT_TYPES].itertuples(index=False, name=None)}
+
+    def filename(self, key, thermocouple=False):
+        """File name of the main (or thermocouple) log of a run."""
+        row = self.runs[(self.runs[KEY_NAMES] == pd.Series(key[:4], index=KEY_NAMES)).all(axis=1)]
+        if row.empty:
+            raise KeyError('Run %s is not in the catalog' % (key,))
+        row = row.iloc[0]
+        name = row['tc_file' if thermocouple else 'file']
+        if pd.isna(name):
+            raise KeyError('Run %s has no %s log' % (key, 'thermocouple' if thermocouple else 'main'))
+        return os.path.join(row['data_folder'], name)
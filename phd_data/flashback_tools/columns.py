@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Column layout of the LabVIEW session logs.
+
+Main log (27 columns, see the column indices in the post-processing scripts)
+and thermocouple log ``*_tc.txt`` (time stamp plus 6 thermocouple channels).
+"""
+
+variables_list = ['time', 'T_u_ambient', 'p_u_ambient', 'x_H2_set', 'x_CH4_set', 'x_C2H6_set', 'x_N2_set', 'D_inner_set', 'D_outer_set', 'H_liner_meas', 'phi_set', 'u_u_set',
+                  'phi_meas', 'u_u_meas', 'x_H2_meas', 'Q_a1_meas', 'Q_a2_meas', 'Q_DNG_meas', 'Q_H2_meas',
+                  'm_mix_dot_meas', 'm_a_dot_meas', 'm_f_dot_meas', 'power_meas', 'rho_u_meas', 'LHV_H2', 'LHV_CH4', 'LHV_C2H6']
+
+tc_variables_list = ['time', 'T_tc1', 'T_tc2', 'T_tc3', 'T_tc4', 'T_tc5', 'T_tc6']
+
+
+def column_index(name, thermocouple=False):
+    """Return the column index of a variable name (or pass an index through)."""
+    if isinstance(name, int):
+        return name
+    names = tc_variables_list if thermocouple else variables_list
+    try:
+        return names.index(name)
+    except ValueError:
+        raise KeyError('Unknown column %r, choose from %s' % (name, names))
+
+
+def column_dtypes(n_columns):
+    """Explicit dtypes for ``pd.read_csv``: time stamps as str, all measurements as float64."""
+    dtypes = {column: 'float64' for column in range(1, n_columns)}
+    dtypes[0] = str
+    return dtypes
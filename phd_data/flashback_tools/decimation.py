@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Decimation of long time series before they are plotted.
+
+A run (or several overlaid runs) has far more samples than the axes have
+pixels. ``minmax_decimate`` keeps the minimum and maximum of every pixel
+column, so peaks and flashback transients stay visible, ``lttb_decimate``
+(largest triangle three buckets) keeps the visual shape with fewer points.
+``plot_decimated`` draws a decimated line and decimates again from the full
+data whenever the view is zoomed or panned. Works for any monotonic x, e.g.
+frame index, time [s] of the main log or of the thermocouple channels.
+"""
+
+import numpy as np
+
+
+def minmax_decimate(x, y, n_bins):
+    """
+    Keep the first and last sample and the minimum and maximum of each of
+    `n_bins` equally sized bins. Returns at most 2*n_bins + 2 points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2*n_bins + 2:
+        return x, y
+
+    size = -(-n//n_bins)
+    n_bins = -(-n//size)
+    low = np.full(n_bins*size, np.inf)
+    high = np.full(n_bins*size, -np.inf)
+    finite = np.isfinite(y)
+    low[:n][finite] = y[finite]
+    high[:n][finite] = y[finite]
+
+    offsets = np.arange(n_bins)*size
+    keep = np.concatenate(([0, n - 1],
+                           offsets + low.reshape(n_bins, size).argmin(axis=1),
+                           offsets + high.reshape(n_bins, size).argmax(axis=1)))
+    keep = np.unique(np.minimum(keep, n - 1))
+    return x[keep], y[keep]
+
+
+def lttb_decimate(x, y, n_out):
+    """
+    Largest triangle three buckets: keep `n_out` points that preserve the
+    visual shape of the line, the first and last point are always kept.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the last bucket)
+        if i < n_out - 3:
+            next_x = xf[edges[i + 1]:edges[i + 2]].mean()
+            next_y = np.nanmean(y[edges[i + 1]:edges[i + 2]])
+        else:
+            next_x, next_y = xf[-1], y[-1]
+        a = keep[i]
+        area = np.abs((xf[a] - next_x)*(y[start:end] - y[a]) - (xf[a] - xf[start:end])*(next_y - y[a]))
+        keep[i + 1] = start + np.nanargmax(area) if np.isfinite(area).any() else start
+
+    return x[keep], y[keep]
+
+
+DECIMATORS = {'minmax': minmax_decimate, 'lttb': lttb_decimate}
+
+
+class DecimatedLine:
+    """
+    A line that shows a decimated copy of (x, y), re-decimated from the full
+    data to the pixel width of the axes after every change of the x limits.
+    """
+
+    def __init__(self, ax, x, y, method='minmax', **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.decimate = DECIMATORS[method]
+        self.points_per_pixel = 1 if method == 'minmax' else 2
+        self.line, = ax.plot(*self._decimated(self.x[0], self.x[-1]), **kwargs)
+        # The callback registry keeps only a weak reference to bound methods, the lambda keeps the line alive
+        ax.callbacks.connect('xlim_changed', lambda ax: self._on_xlim_changed(ax))
+
+    def _decimated(self, x_min, x_max):
+        start = max(np.searchsorted(self.x, x_min, side='left') - 1, 0)
+        end = min(np.searchsorted(self.x, x_max, side='right') + 1, len(self.x))
+        n_pixels = max(int(self.ax.get_window_extent().width), 100)
+        return self.decimate(self.x[start:end], self.y[start:end], n_pixels*self.points_per_pixel)
+
+    def _on_xlim_changed(self, ax):
+        self.line.set_data(*self._decimated(*ax.get_xlim()))
+        ax.figure.canvas.draw_idle()
+
+
+def plot_decimated(ax, x, y, method='minmax', **kwargs):
+    """Plot y against monotonic x with at most a few points per pixel, kept up to date on zoom. Returns the DecimatedLine."""
+    return DecimatedLine(ax, x, y, method, **kwargs)
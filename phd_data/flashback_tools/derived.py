@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Recomputation of the derived quantities of the session logs.
+
+The LabVIEW control panel logs phi, u_u, the measured hydrogen fraction, the
+mass flows, the thermal power and the unburned density next to the raw flows
+Q_a1, Q_DNG, Q_H2 [ln/min], T_u and p_u. ``derive_quantities`` recomputes
+them from the raw columns with the relations of the control panel:
+
+- STP correction: STP = (T_u/T_STP)*(p_STP/p_u), actual flow = STP*normal flow;
+- molar flow = normal flow/V_m with the molar volume V_m = R*T_STP/p_STP;
+- u_u = actual flow of air 1 + DNG + H2 over the annulus between D_inner and D_outer;
+- phi = stoichiometric air of the fuel (composition from the x_*_set columns) / air 1;
+- x_H2_meas = Q_H2/(Q_DNG + Q_H2);
+- mass flows from the molar flows and molar masses, power from the fuel mass
+  flows and the LHV_* columns, rho_u = m_mix/actual flow.
+
+These reproduce the logged values within the 4 decimals of the logs.
+``derive_runs`` stacks all rows of all runs into one array per column and
+recomputes everything in a single pass, so a campaign can be reprocessed
+with corrected constants (``constants``) or corrected columns, e.g. the DNG
+composition or an LHV (``overrides``). ``check_derived`` flags the rows
+where the logged and recomputed values differ.
+"""
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.run_table import INDEX_NAMES
+
+# Constants of the control panel
+DERIVED_CONSTANTS = {'T_STP': 273.15,          # [K]
+                     'p_STP': 101325.0,        # [Pa]
+                     'R': 8.314,               # [J/(mol K)]
+                     'O2_in_air': 0.21,        # mole fraction of O2 in air [-]
+                     'molar_mass': {'air': 28.97e-3, 'H2': 2.016e-3, 'CH4': 16.043e-3,
+                                    'C2H6': 30.07e-3, 'N2': 28.014e-3}}   # [kg/mol]
+
+# Moles of O2 per mole of fuel for complete combustion
+O2_STOICHIOMETRIC = {'H2': 0.5, 'CH4': 2.0, 'C2H6': 3.5}
+
+# Raw columns the derived quantities are computed from
+RAW_COLUMNS = ['T_u_ambient', 'p_u_ambient', 'x_H2_set', 'x_CH4_set', 'x_C2H6_set', 'x_N2_set',
+               'D_inner_set', 'D_outer_set', 'Q_a1_meas', 'Q_DNG_meas', 'Q_H2_meas', 'LHV_H2', 'LHV_CH4', 'LHV_C2H6']
+
+# Logged columns that are recomputed
+DERIVED_COLUMNS = ['phi_meas', 'u_u_meas', 'x_H2_meas', 'm_mix_dot_meas', 'm_a_dot_meas', 'm_f_dot_meas',
+                   'power_meas', 'rho_u_meas']
+
+# Maximum difference between logged and recomputed values, a few times the log resolution
+DERIVED_TOLERANCE = {'phi_meas': 2e-4, 'u_u_meas': 2e-4, 'x_H2_meas': 2e-4, 'm_mix_dot_meas': 2e-4,
+                     'm_a_dot_meas': 2e-4, 'm_f_dot_meas': 2e-4, 'power_meas': 2e-3, 'rho_u_meas': 2e-4}
+
+
+def derive_quantities(columns, constants=None, overrides=None):
+    """
+    Derived quantities of one block of rows.
+
+    `columns` maps the names in RAW_COLUMNS to arrays (a CompactRun works as
+    well), `constants` replaces entries of DERIVED_CONSTANTS and `overrides`
+    maps raw column names to corrected values (scalars or arrays). Returns a
+    dict name in DERIVED_COLUMNS -> float64 array.
+    """
+    constants = dict(DERIVED_CONSTANTS, **(constants or {}))
+    M = dict(DERIVED_CONSTANTS['molar_mass'], **constants['molar_mass'])
+    overrides = overrides or {}
+    c = {name: np.asarray(overrides[name] if name in overrides else columns[name], dtype=np.float64)
+         for name in RAW_COLUMNS}
+
+    molar_volume = constants['R']*constants['T_STP']/constants['p_STP']
+    STP = c['T_u_ambient']/constants['T_STP']*constants['p_STP']/c['p_u_ambient']
+    area = np.pi/4*(c['D_inner_set']**2 - c['D_outer_set']**2)*1e-6
+
+    # Normal flows [m^3n/s] and molar flows [mol/s]
+    Q_air = c['Q_a1_meas']/60000
+    Q_DNG = c['Q_DNG_meas']/60000
+    Q_H2 = c['Q_H2_meas']/60000
+    Q_fuel = Q_DNG + Q_H2
+    Q_mix = Q_air + Q_fuel
+
+    # Stoichiometric air of the set fuel blend [mol air/mol fuel]
+    O2_DNG = c['x_CH4_set']*O2_STOICHIOMETRIC['CH4'] + c['x_C2H6_set']*O2_STOICHIOMETRIC['C2H6']
+    air_stoichiometric = (c['x_H2_set']*O2_STOICHIOMETRIC['H2'] + (1 - c['x_H2_set'])*O2_DNG)/constants['O2_in_air']
+
+    M_DNG = c['x_CH4_set']*M['CH4'] + c['x_C2H6_set']*M['C2H6'] + c['x_N2_set']*M['N2']
+    m_a = Q_air/molar_volume*M['air']
+    m_f = (Q_H2*M['H2'] + Q_DNG*M_DNG)/molar_volume
+    power = (Q_H2*M['H2']*c['LHV_H2'] +
+             Q_DNG*(c['x_CH4_set']*M['CH4']*c['LHV_CH4'] + c['x_C2H6_set']*M['C2H6']*c['LHV_C2H6']))/molar_volume
+
+    # Like the control panel, without flow these are NaN (0/0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        phi = Q_fuel*air_stoichiometric/Q_air
+        x_H2 = Q_H2/Q_fuel
+        rho_u = (m_a + m_f)/(Q_mix*STP)
+
+    return {'phi_meas': phi, 'u_u_meas': Q_mix*STP/area, 'x_H2_meas': x_H2, 'm_mix_dot_meas': m_a + m_f,
+            'm_a_dot_meas': m_a, 'm_f_dot_meas': m_f, 'power_meas': power/1000, 'rho_u_meas': rho_u}
+
+
+def stack_runs(runs, columns):
+    """
+    All rows of all runs (dict run key -> CompactRun or DataFrame with named
+    columns) as one float64 array per column, and the row offsets of the runs.
+    """
+    runs = list(runs.values())
+    offsets = np.cumsum([0] + [len(run) for run in runs])
+    stacked = {name: np.concatenate([np.asarray(run[name], dtype=np.float64) for run in runs]) for name in columns}
+    return stacked, offsets
+
+
+def derive_runs(runs, constants=None, overrides=None):
+    """
+    Derived quantities of all runs, computed in one pass over the stacked
+    rows. Returns a dict run key -> dict name -> array.
+    """
+    stacked, offsets = stack_runs(runs, RAW_COLUMNS)
+    derived = derive_quantities(stacked, constants, overrides)
+    return {key: {name: values[start:end] for name, values in derived.items()}
+            for key, start, end in zip(runs, offsets[:-1], offsets[1:])}
+
+
+def check_derived(runs, constants=None, overrides=None, tolerance=None):
+    """
+    Compare the logged derived quantities of all runs with the recomputed ones.
+
+    Returns a DataFrame indexed by (hydrogen_percentage, phi, test_nr, date,
+    column) with the rows of the run, the number and fraction of flagged rows,
+    the first flagged frame (-1 if none) and the largest difference. Runs
+    must have at least one row.
+    """
+    tolerance = dict(DERIVED_TOLERANCE, **(tolerance or {}))
+    stacked, offsets = stack_runs(runs, RAW_COLUMNS + DERIVED_COLUMNS)
+    recomputed = derive_quantities(stacked, constants, overrides)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    rows = np.arange(offsets[-1])
+
+    table = []
+    for name in DERIVED_COLUMNS:
+        difference = np.abs(recomputed[name] - stacked[name])
+        both_nan = np.isnan(recomputed[name]) & np.isnan(stacked[name])
+        flagged = ~(difference <= tolerance[name]) & ~both_nan
+        n_flagged = np.add.reduceat(flagged, starts)
+        first = np.minimum.reduceat(np.where(flagged, rows, offsets[-1]), starts) - starts
+        index = pd.MultiIndex.from_tuples([tuple(key[:4]) + (name,) for key in runs], names=INDEX_NAMES[:4] + ['column'])
+        table.append(pd.DataFrame({'rows': lengths, 'flagged': n_flagged, 'first_flagged': np.where(n_flagged > 0, first, -1),
+                                   'max_difference': np.maximum.reduceat(np.where(both_nan, 0.0, difference), starts)},
+                                  index=index))
+    table = pd.concat(table)
+    table['flagged_fraction'] = table['flagged']/table['rows']
+    return table
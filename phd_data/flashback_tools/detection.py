@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Automatic detection of the flashback events in a run.
+
+Proposes the three frame indices that are annotated by hand in
+``flashback_data``: [design point, first sign of FB, FB]. The detector works
+on the aligned main + thermocouple table of a run (see thermocouple) with
+whole-array operations only:
+
+- design point: first frame at which the velocity set point u_u_set has been
+  reached and is then held for at least `min_hold_s`, i.e. the first stable
+  plateau of the u_u ramp;
+- first sign of FB: first frame after the design point at which the
+  temperature rise rate of one of the liner thermocouples has increased by
+  more than `first_sign_rate` [K/s] compared to `baseline_s` earlier and
+  stays increased for `first_sign_hold_s`, the liner itself heats up slowly
+  during the whole run and a single step of the set point gives short peaks;
+- FB: first frame in the last `FB_search_s` before the fuel is shut off
+  (phi_meas drops to zero) at which the temperature rise rate exceeds
+  `FB_rate` [K/s], or else the last frame before the fuel is shut off.
+
+``compare_with_annotations`` reports where the proposals disagree with the
+hand-annotated indices. DETECTOR_SETTINGS are fitted on the 56 annotated
+runs of Steel liner set 1: within 25 frames the detector agrees with 82% of
+the FB, 55% of the first sign of FB and 36% of the design point annotations
+(tests/test_detection.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.run_table import EVENT_TYPES
+from flashback_tools.thermocouple import load_aligned_runs
+
+# Thermocouple channels on the liner, used for the temperature rise rate
+LINER_CHANNELS = ['T_tc1', 'T_tc2', 'T_tc3', 'T_tc4']
+
+# Default detector settings
+DETECTOR_SETTINGS = {'rate_window_s': 2.0,      # window of the temperature rise rate [s]
+                     'baseline_s': 40.0,        # lag of the baseline rise rate [s]
+                     'first_sign_rate': 2.0,    # increase of the rise rate at the first sign of FB [K/s]
+                     'first_sign_hold_s': 4.0,  # minimum duration of the increase at the first sign of FB [s]
+                     'FB_rate': 10.0,           # rise rate at FB [K/s]
+                     'FB_search_s': 30.0,       # search window for FB before the fuel is shut off [s]
+                     'velocity_tol': 0.02,      # relative deviation of u_u_meas from u_u_set [-]
+                     'min_hold_s': 90.0,        # minimum duration of the design point plateau [s]
+                     'phi_off': 0.05}           # phi_meas below which the fuel is off [-]
+
+
+def rise_rate(time_s, values, window_s):
+    """
+    Temperature rise rate [K/s] over a trailing window, for all channels at once.
+
+    `values` is a (n_frames, n_channels) array, the rate at frame i is taken
+    between frame i and the first frame at least `window_s` earlier (frames
+    without such a frame get the rate of the first complete window).
+    """
+    time_s = np.asarray(time_s, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(time_s), -1)
+    start = np.searchsorted(time_s, time_s - window_s, side='right') - 1
+    valid = start >= 0
+    start = np.where(valid, start, 0)
+    dt = time_s - time_s[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (values - values[start])/dt[:, np.newaxis]
+    rate[~valid | (dt == 0)] = np.nan
+    return rate
+
+
+def _first(mask, start=0):
+    # First index >= start where mask is True, or None
+    hits = np.flatnonzero(mask[start:])
+    return int(hits[0]) + start if len(hits) else None
+
+
+def _held(mask, time_s, hold_s):
+    # True at the frames from which mask stays True for hold_s (or up to the end of mask)
+    if hold_s <= 0:
+        return mask
+    time_s = time_s[:len(mask)]
+    end = np.searchsorted(time_s, time_s + hold_s)
+    misses = np.concatenate(([0], np.cumsum(~mask)))
+    return mask & (misses[end] == misses[:-1])
+
+
+def detect_events(run, settings=None):
+    """
+    Propose [design, first sign of FB, FB] frame indices for one aligned run.
+
+    `run` needs the columns time_ms, u_u_set, u_u_meas, phi_meas and the
+    liner thermocouple channels. Frames that cannot be found are None.
+    """
+    settings = dict(DETECTOR_SETTINGS, **(settings or {}))
+    time_s = (run['time_ms'].to_numpy() - run['time_ms'].iloc[0])/1000
+    u_u_set = run['u_u_set'].to_numpy()
+    u_u_meas = run['u_u_meas'].to_numpy()
+    phi_meas = run['phi_meas'].to_numpy()
+
+    # End of the run: last frame before the fuel is shut off
+    fuel_off = _first(phi_meas < settings['phi_off'])
+    last = (fuel_off if fuel_off is not None else len(run)) - 1
+    if last < 1:
+        return [None, None, None]
+
+    # Frames without a complete window have a NaN rate and never trigger an event
+    rate = rise_rate(time_s, run[LINER_CHANNELS].to_numpy(), settings['rate_window_s'])
+
+    # FB: steep temperature rise on the liner just before the end of the run, else the end of the run
+    search_start = np.searchsorted(time_s, time_s[last] - settings['FB_search_s'])
+    with np.errstate(invalid='ignore'):
+        FB = _first((rate[:last + 1] > settings['FB_rate']).any(axis=1), search_start)
+    if FB is None:
+        FB = last
+
+    # Design point: start of the first set point plateau of at least min_hold_s that is reached
+    set_changes = np.flatnonzero(np.diff(u_u_set[:FB + 1]) != 0) + 1
+    plateau_start = np.concatenate(([0], set_changes))
+    plateau_end = np.concatenate((set_changes, [FB + 1]))
+    long_plateaus = (time_s[plateau_end - 1] - time_s[plateau_start]) >= settings['min_hold_s']
+    settled = np.abs(u_u_meas - u_u_set) <= settings['velocity_tol']*np.abs(u_u_set)
+    design = None
+    for start, end in zip(plateau_start[long_plateaus], plateau_end[long_plateaus]):
+        design = _first(settled[start:end])
+        if design is not None:
+            design += start
+            break
+
+    # First sign of FB: the liner starts to heat up faster after the design point
+    baseline = np.searchsorted(time_s, time_s - settings['baseline_s'], side='right') - 1
+    rate_increase = rate - rate[np.maximum(baseline, 0)]
+    rate_increase[baseline < 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        increased = (rate_increase[:FB] > settings['first_sign_rate']).any(axis=1)
+    first_sign_FB = _first(_held(increased, time_s, settings['first_sign_hold_s']), design or 0)
+
+    return [design, first_sign_FB, FB]
+
+
+def detect_session(keys, data_folder='.', settings=None, max_workers=None):
+    """Proposed [design, first sign of FB, FB] frame indices for many runs, as a dict."""
+    columns = ['u_u_set', 'u_u_meas', 'phi_meas']
+    runs = load_aligned_runs(keys, columns, data_folder, max_workers=max_workers)
+    return {key: detect_events(run, settings) for key, run in runs.items()}
+
+
+def compare_with_annotations(detected, flashback_data, tolerance_frames=25):
+    """
+    Table of detected versus hand-annotated frame indices.
+
+    One row per (run, event) with the columns 'annotated', 'detected',
+    'difference' and 'agrees'. Both missing counts as agreement, one missing
+    as disagreement.
+    """
+    rows = []
+    for key, proposal in detected.items():
+        annotation = flashback_data.get(key, [None]*len(EVENT_TYPES))
+        for event, annotated, found in zip(EVENT_TYPES, annotation[:len(EVENT_TYPES)], proposal):
+            if annotated is None or found is None:
+                difference = None
+                agrees = annotated is None and found is None
+            else:
+                difference = found - annotated
+                agrees = abs(difference) <= tolerance_frames
+            rows.append(tuple(key[:4]) + (event, annotated, found, difference, agrees))
+
+    columns = ['hydrogen_percentage', 'phi', 'test_nr', 'date', 'event', 'annotated', 'detected', 'difference', 'agrees']
+    return pd.DataFrame(rows, columns=columns).set_index(columns[:5])
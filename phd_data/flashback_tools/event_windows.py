@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Statistics of the measured columns in a window of frames before every event.
+
+The event table takes one instantaneous sample at each annotated frame, while
+phi_meas and u_u_meas fluctuate from frame to frame. ``window_statistics``
+stacks all runs like build_event_table, takes a strided sliding window view
+of the stacked array and gathers the `window` frames up to and including
+every event frame of all runs with one fancy-indexing pass; frames before
+the start of a run are masked and event frames outside their run raise an
+IndexError. The mean, standard deviation and percentiles
+follow from reductions over the last axis.
+
+``pool_repeats`` pools the windows of the repeated tests (test 1..4) of a
+mixture per (hydrogen_percentage, phi, event) and ``pooled_errorbars`` draws
+the pooled mean +/- standard deviation as error bars on the FB maps.
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
+
+from flashback_tools.run_table import EVENT_COLUMNS, INDEX_NAMES, check_frames, event_frames, run_values
+
+# Default window before the events [frames], about 5 s of the main log
+EVENT_WINDOW = 25
+
+# Default percentiles of the window statistics
+WINDOW_PERCENTILES = (5, 50, 95)
+
+POOLED_INDEX = ['hydrogen_percentage', 'phi', 'event']
+
+
+def event_windows(flashback_data, runs, columns=EVENT_COLUMNS, window=EVENT_WINDOW):
+    """
+    The `window` frames up to and including the event frames of all runs.
+
+    Returns (keys, events, frames, windows) with `windows` a (n_events,
+    n_columns, window) float64 array, NaN where the window reaches before the
+    first frame of the run. Raises an IndexError when a frame index is
+    outside its run.
+    """
+    columns = list(columns)
+    keys, events, frames = event_frames(flashback_data)
+    run_keys = list(dict.fromkeys(keys))
+    arrays = [run_values(runs[key], columns) for key in run_keys]
+    run_offsets = np.concatenate(([0], np.cumsum([len(array) for array in arrays])))
+    run_numbers = {key: number for number, key in enumerate(run_keys)}
+    run_numbers = np.array([run_numbers[key] for key in keys], dtype=np.int64)
+    for number, key in enumerate(run_keys):
+        check_frames(key, frames[run_numbers == number], len(arrays[number]))
+
+    # Prepend window - 1 rows so the window of frame 0 of the first run exists
+    stacked = np.concatenate([np.full((window - 1, len(columns)), np.nan)] + arrays)
+    view = sliding_window_view(stacked, window, axis=0)
+    rows = run_offsets[run_numbers] + frames
+
+    # Mask the frames of the previous run (or the padding)
+    positions = rows[:, np.newaxis] - window + 1 + np.arange(window)
+    before_start = positions < run_offsets[run_numbers][:, np.newaxis]
+    windows = np.where(before_start[:, np.newaxis, :], np.nan, view[rows])
+    return keys, events, frames, windows
+
+
+def window_statistics(flashback_data, runs, columns=EVENT_COLUMNS, window=EVENT_WINDOW, percentiles=WINDOW_PERCENTILES):
+    """
+    Mean, standard deviation and percentiles of the columns in the window
+    before every event.
+
+    Returns a DataFrame indexed like the event table with per column the
+    columns '<column>_mean', '<column>_std' and '<column>_p<percentile>', plus
+    'n' (frames in the window), 'H2' and 'frame'.
+    """
+    columns = list(columns)
+    keys, events, frames, windows = event_windows(flashback_data, runs, columns, window)
+    n = np.sum(~np.isnan(windows[:, 0, :]), axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(windows, axis=2)
+        std = np.nanstd(windows, axis=2, ddof=1)
+        quantiles = np.nanpercentile(windows, percentiles, axis=2)
+
+    data = {}
+    for i, column in enumerate(columns):
+        data[column + '_mean'] = mean[:, i]
+        data[column + '_std'] = std[:, i]
+        for percentile, values in zip(percentiles, quantiles):
+            data['{}_p{:g}'.format(column, percentile)] = values[:, i]
+    index = pd.MultiIndex.from_tuples([tuple(key[:4]) + (event,) for key, event in zip(keys, events)],
+                                      names=INDEX_NAMES)
+    table = pd.DataFrame(data, index=index)
+    table['n'] = n
+    table['H2'] = [int(key[0].lstrip('H')) for key in keys]
+    table['frame'] = frames
+    return table
+
+
+def pool_repeats(window_table, columns=('phi_meas', 'u_u_meas')):
+    """
+    Pool the windows of the repeated tests per (hydrogen_percentage, phi, event).
+
+    The pooled standard deviation is that of all frames of the windows
+    together, i.e. it includes the spread between the tests. Returns a
+    DataFrame with '<column>_mean', '<column>_std', 'n_tests', 'n' and 'H2'.
+    """
+    table = window_table.reset_index()
+    n = table['n'].to_numpy(dtype=np.float64)
+    sums = {'n': n}
+    for column in columns:
+        mean, std = table[column + '_mean'].to_numpy(), table[column + '_std'].fillna(0).to_numpy()
+        sums[column + '_sum'] = n*mean
+        sums[column + '_sum_sq'] = (n - 1)*std**2 + n*mean**2
+    groups = pd.DataFrame(sums).groupby([table[name] for name in POOLED_INDEX], sort=False)
+    totals = groups.sum()
+    n_total = totals['n'].to_numpy()
+
+    pooled = pd.DataFrame(index=totals.index)
+    for column in columns:
+        mean = totals[column + '_sum'].to_numpy()/n_total
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (totals[column + '_sum_sq'].to_numpy() - n_total*mean**2)/(n_total - 1)
+        pooled[column + '_mean'] = mean
+        pooled[column + '_std'] = np.sqrt(np.maximum(variance, 0))
+    pooled['n_tests'] = groups.size().to_numpy()
+    pooled['n'] = n_total.astype(np.int64)
+    pooled['H2'] = [int(hydrogen_percentage.lstrip('H')) for hydrogen_percentage in
+                    pooled.index.get_level_values('hydrogen_percentage')]
+    return pooled
+
+
+def pooled_errorbars(pooled, x='phi_meas', y='u_u_meas', colors=None, ax=None, **kwargs):
+    """
+    Error bars (mean +/- standard deviation) of a pooled table on an FB map,
+    one artist per hydrogen content when `colors` maps the hydrogen
+    percentages to colors, else one black artist. Returns the artists.
+    """
+    if ax is None:
+        ax = plt.gca()
+    kwargs = dict({'fmt': 'none', 'capsize': 2, 'elinewidth': 0.8, 'alpha': 0.7, 'zorder': 1}, **kwargs)
+
+    if colors is None:
+        groups = [(None, pooled)]
+    else:
+        groups = pooled.sort_values('H2', kind='stable').groupby(level='hydrogen_percentage', sort=False)
+    artists = []
+    for hydrogen_percentage, group in groups:
+        color = 'k' if colors is None else colors[hydrogen_percentage]
+        artists.append(ax.errorbar(group[x + '_mean'], group[y + '_mean'], xerr=group[x + '_std'],
+                                   yerr=group[y + '_std'], ecolor=color, **kwargs))
+    return artists
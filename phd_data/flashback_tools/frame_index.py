@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Random access to single frames (rows) of a session log.
+
+For every data file the byte offset of each line is computed once and stored
+next to the columnar cache as ``session_*/.cache/<run>/row_offsets.npy``.
+``get_frames`` then seeks directly to the requested lines instead of reading
+the whole run, e.g. to fetch the design, first sign of FB and FB frames.
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.columns import column_dtypes, column_index, tc_variables_list, variables_list
+from flashback_tools.loader import run_filename
+from flashback_tools.session_cache import cache_dir
+
+
+def build_row_offsets(filename):
+    """
+    Byte offsets of the start of every line of a file.
+
+    The returned array has one extra entry (the file size), so line i spans
+    offsets[i]:offsets[i + 1].
+    """
+    with open(filename, 'rb') as f:
+        content = np.frombuffer(f.read(), dtype=np.uint8)
+    line_ends = np.flatnonzero(content == ord('\n')) + 1
+    if len(content) and content[-1] != ord('\n'):
+        line_ends = np.append(line_ends, len(content))
+    return np.concatenate(([0], line_ends)).astype(np.int64)
+
+
+def row_offsets(filename):
+    """
+    Return the row offsets of a file, building and storing them if needed.
+
+    The stored offsets are used when they end at the current file size and
+    are not older than the file.
+    """
+    offsets_file = os.path.join(cache_dir(filename), 'row_offsets.npy')
+    stat = os.stat(filename)
+
+    if os.path.isfile(offsets_file) and os.stat(offsets_file).st_mtime_ns >= stat.st_mtime_ns:
+        offsets = np.load(offsets_file)
+        if offsets[-1] == stat.st_size:
+            return offsets
+
+    offsets = build_row_offsets(filename)
+    os.makedirs(os.path.dirname(offsets_file), exist_ok=True)
+    np.save(offsets_file, offsets)
+    return offsets
+
+
+def read_frames(filename, frame_indices, columns=None):
+    """
+    Read only the given rows of a data file.
+
+    Returns a DataFrame labelled by column index (like ``pd.read_csv(header=None)``)
+    and indexed by frame index. None entries in `frame_indices` are skipped.
+    """
+    offsets = row_offsets(filename)
+    n_rows = len(offsets) - 1
+    frames = np.unique([frame for frame in frame_indices if frame is not None]).astype(np.int64)
+    if len(frames) and (frames[0] < 0 or frames[-1] >= n_rows):
+        raise IndexError('Frame index out of range for %s (%d rows)' % (filename, n_rows))
+
+    lines = []
+    with open(filename, 'rb') as f:
+        for frame in frames:
+            f.seek(offsets[frame])
+            lines.append(f.read(offsets[frame + 1] - offsets[frame]).rstrip(b'\r\n'))
+
+    if not lines:
+        return pd.DataFrame([], columns=columns)
+
+    n_columns = lines[0].count(b',') + 1
+    if columns is None:
+        columns = list(range(n_columns))
+    dtypes = column_dtypes(n_columns)
+    data = pd.read_csv(io.BytesIO(b'\n'.join(lines)), header=None, names=range(n_columns), usecols=columns,
+                       dtype={column: dtypes[column] for column in columns})
+    data = data[list(columns)]
+    data.index = frames
+    return data
+
+
+def get_frames(key, frame_indices, columns=None, data_folder='.', thermocouple=False, column_labels='name'):
+    """
+    Read the given frames of a run without loading the whole run.
+
+    `key` is a run key as in ``flashback_data`` and `columns` a list of
+    variable names (or column indices). The result is indexed by frame index.
+    """
+    names = tc_variables_list if thermocouple else variables_list
+    if columns is None:
+        columns = names
+    indices = [column_index(column, thermocouple) for column in columns]
+
+    data = read_frames(run_filename(key, data_folder, thermocouple), frame_indices, indices)
+    if column_labels == 'name':
+        data.columns = [names[index] for index in indices]
+    return data
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Live tail mode: follow a session directory while it is being recorded.
+
+The LabVIEW control panel keeps appending rows to the log of the current run.
+``SessionWatcher`` polls ``session_YYYY-MM-DD/`` for main logs, reads only the
+bytes appended since the previous poll (a trailing incomplete line is kept
+until it is completed) and appends the parsed rows to an in-memory table per
+run. ``LiveFlashbackMap`` shows the latest operating point of every run on
+the FB maps of figures 6 and 8 and only moves the points of runs that got
+new rows. ``watch_session`` ties both together in a polling loop.
+"""
+
+import glob
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from flashback_tools.columns import column_dtypes, column_index
+from flashback_tools.loader import parse_run_filename
+
+# Columns kept in memory for the live FB maps
+LIVE_COLUMNS = ['phi_meas', 'u_u_meas', 'power_meas']
+
+
+class FileTail:
+    """Read the lines appended to a growing text file since the previous call."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0
+        self.partial = b''
+
+    def read_new_lines(self):
+        """Return the new complete lines as bytes (empty if nothing was added)."""
+        size = os.path.getsize(self.filename)
+        if size < self.offset:
+            # The file was replaced or truncated, start over
+            self.offset = 0
+            self.partial = b''
+        if size == self.offset:
+            return b''
+
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        self.offset += len(chunk)
+
+        data = self.partial + chunk
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        return data[:end]
+
+
+class GrowingTable:
+    """Float64 columns that grow by amortised doubling, without copying the old rows on every append."""
+
+    def __init__(self, columns, capacity=1024):
+        self.columns = list(columns)
+        self.values = np.empty((capacity, len(self.columns)))
+        self.n_rows = 0
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.columns))
+        needed = self.n_rows + len(rows)
+        if needed > len(self.values):
+            values = np.empty((max(needed, 2*len(self.values)), len(self.columns)))
+            values[:self.n_rows] = self.values[:self.n_rows]
+            self.values = values
+        self.values[self.n_rows:needed] = rows
+        self.n_rows = needed
+
+    def to_frame(self):
+        return pd.DataFrame(self.values[:self.n_rows].copy(), columns=self.columns)
+
+    def last(self):
+        return dict(zip(self.columns, self.values[self.n_rows - 1])) if self.n_rows else None
+
+    def __len__(self):
+        return self.n_rows
+
+
+class SessionWatcher:
+    """
+    Follow all main logs in a session directory.
+
+    Each call of `poll` picks up new run files and the rows appended to the
+    known ones, and returns the keys of the runs that changed.
+    """
+
+    def __init__(self, session_dir, columns=LIVE_COLUMNS):
+        self.session_dir = session_dir
+        self.columns = list(columns)
+        self.indices = [column_index(column) for column in self.columns]
+        self.tails = {}
+        self.tables = {}
+
+    def _discover(self):
+        for filename in glob.glob(os.path.join(self.session_dir, 'H*_phi=*_test*.txt')):
+            parsed = parse_run_filename(filename)
+            if parsed is None or parsed[1] or parsed[0] in self.tails:
+                continue
+            self.tails[parsed[0]] = FileTail(filename)
+            self.tables[parsed[0]] = GrowingTable(self.columns)
+
+    def _parse(self, lines):
+        n_columns = lines[:lines.index(b'\n')].count(b',') + 1
+        dtypes = column_dtypes(n_columns)
+        data = pd.read_csv(io.BytesIO(lines), header=None, names=range(n_columns), usecols=self.indices,
+                           dtype={index: dtypes[index] for index in self.indices})
+        return data[self.indices].to_numpy()
+
+    def poll(self):
+        """Read everything that was appended since the previous poll, return the changed run keys."""
+        self._discover()
+        changed = []
+        for key, tail in self.tails.items():
+            lines = tail.read_new_lines()
+            if lines:
+                self.tables[key].append(self._parse(lines))
+                changed.append(key)
+        return changed
+
+    def run(self, key):
+        """All rows of a run read so far, as a DataFrame."""
+        return self.tables[key].to_frame()
+
+
+class LiveFlashbackMap:
+    """
+    Latest operating point of every run on the FB maps (figures 6 and 8).
+
+    Every run has its own artist on both figures, `update` only moves the
+    artists of the given runs and redraws the figures.
+    """
+
+    def __init__(self, H_colors, fig_nrs=(6, 8), marker='^'):
+        self.H_colors = H_colors
+        self.marker = marker
+        self.fig_H = plt.figure(fig_nrs[0])
+        self.fig_power = plt.figure(fig_nrs[1])
+        self.ax_H = self.fig_H.gca()
+        self.ax_power = self.fig_power.gca()
+        self.artists = {}
+
+        for ax in (self.ax_H, self.ax_power):
+            ax.set_xlabel('$\\phi$ [-]')
+            ax.set_ylabel('$u_{u}$ [m/s]')
+            ax.set_xlim(0.25, 1.1)
+            ax.set_ylim(0, 9.00)
+            ax.grid(True, which='major', color='#666666', linestyle='--', axis='both')
+            ax.set_title('Flashback propensity map (live)')
+
+        self.power_mappable = self.ax_power.scatter([], [], c=[], cmap='coolwarm', vmin=0, vmax=20)
+        cbar = self.fig_power.colorbar(self.power_mappable, ax=self.ax_power)
+        cbar.set_label('Thermal power output [kW]')
+
+    def update(self, watcher, keys):
+        """Move the points of the runs in `keys` to their latest row."""
+        for key in keys:
+            last = watcher.tables[key].last()
+            if last is None:
+                continue
+            point = [[last['phi_meas'], last['u_u_meas']]]
+            if key not in self.artists:
+                color = self.H_colors.get(key[0], 'k')
+                self.artists[key] = (self.ax_H.scatter(last['phi_meas'], last['u_u_meas'], color=color, marker=self.marker),
+                                     self.ax_power.scatter(last['phi_meas'], last['u_u_meas'], c=[last['power_meas']],
+                                                           cmap='coolwarm', vmin=0, vmax=20, marker=self.marker))
+            artist_H, artist_power = self.artists[key]
+            artist_H.set_offsets(point)
+            artist_power.set_offsets(point)
+            artist_power.set_array(np.array([last['power_meas']]))
+
+        if keys:
+            self.fig_H.canvas.draw_idle()
+            self.fig_power.canvas.draw_idle()
+
+
+def watch_session(session_dir, H_colors, interval=0.2, duration=None):
+    """
+    Follow a session directory and keep the live FB maps up to date.
+
+    Polls every `interval` seconds (the latency from a row being written to
+    being shown is about one interval) until `duration` seconds have passed,
+    or forever. Returns the watcher with the rows read so far.
+    """
+    watcher = SessionWatcher(session_dir)
+    live_map = LiveFlashbackMap(H_colors)
+    start = time.time()
+
+    while duration is None or time.time() - start < duration:
+        live_map.update(watcher, watcher.poll())
+        plt.pause(interval)
+
+    return watcher
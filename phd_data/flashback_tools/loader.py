@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel, column-selective loading of all runs of a liner set.
+
+A run is identified by the same key as in ``flashback_data``:
+(hydrogen percentage, phi, test nr, date), e.g. ('H0', '0.70', '1', '2020-07-28').
+Only the requested columns are loaded, either from the columnar cache
+(see session_cache) or directly with ``pd.read_csv(usecols=..., dtype=...)``,
+and the files are spread over a thread or process pool.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from flashback_tools.columns import column_dtypes, column_index, tc_variables_list, variables_list
+from flashback_tools.session_cache import read_session_file
+
+
+# File name of a run: H{pct}_phi={phi}_u1=x_{date}_test{n}[_tc].txt
+RUN_FILENAME_PATTERN = re.compile(r'^(H\d+)_phi=([\d.]+)_u1=x_(\d{4}-\d{2}-\d{2})_test(\d+)(_tc)?\.txt$')
+
+
+def parse_run_filename(filename):
+    """
+    Run key (hydrogen percentage, phi, test nr, date) and thermocouple flag of a
+    data file name, or None if the name does not follow the pattern.
+    """
+    match = RUN_FILENAME_PATTERN.match(os.path.basename(filename))
+    if match is None:
+        return None
+    hydrogen_percentage, phi, date, test_nr, tc = match.groups()
+    return (hydrogen_percentage, phi, test_nr, date), tc is not None
+
+
+def run_filename(key, data_folder='.', thermocouple=False):
+    """File name of the main (or thermocouple) log of a run."""
+    hydrogen_percentage, phi, test_nr, date = key[:4]
+    data_dir = os.path.join(data_folder, 'session_' + str(date))
+    filename = str(hydrogen_percentage) + '_phi=' + str(phi) + '_u1=x_' + str(date) + '_test' + str(test_nr)
+    if thermocouple:
+        filename += '_tc'
+    return os.path.join(data_dir, filename + '.txt')
+
+
+def load_run(key, columns=None, data_folder='.', thermocouple=False, use_cache=True, column_labels='name'):
+    """
+    Load the selected columns of one run.
+
+    `columns` is a list of variable names (or column indices), None loads all
+    columns. With `column_labels='index'` the DataFrame columns are labelled
+    by their column index like ``pd.read_csv(filename, header=None)``.
+    """
+    names = tc_variables_list if thermocouple else variables_list
+    if columns is None:
+        columns = names
+    indices = [column_index(column, thermocouple) for column in columns]
+    filename = run_filename(key, data_folder, thermocouple)
+
+    if use_cache:
+        data = read_session_file(filename, columns=indices)
+    else:
+        dtypes = column_dtypes(len(names))
+        data = pd.read_csv(filename, header=None, usecols=indices, dtype={index: dtypes[index] for index in indices})
+        data = data[indices]
+
+    if column_labels == 'name':
+        data.columns = [names[index] for index in indices]
+    return data
+
+
+def _load_run_job(job):
+    key, kwargs = job
+    wall, cpu = time.perf_counter(), time.thread_time()
+    run = load_run(key, **kwargs)
+    return key, run, time.perf_counter() - wall, time.thread_time() - cpu
+
+
+def load_runs(keys, columns=None, data_folder='.', thermocouple=False, use_cache=True, column_labels='name',
+              max_workers=None, use_processes=False, profiler=None):
+    """
+    Load the selected columns of many runs concurrently.
+
+    Returns a dict run key -> DataFrame in the order of `keys`. Threads are
+    used by default; `use_processes=True` uses a process pool, which needs
+    the usual ``if __name__ == '__main__':`` guard in the calling script.
+    With a `profiler` (see profiling) the load time and rows of every run
+    are recorded in its open stage.
+    """
+    keys = list(keys)
+    kwargs = {'columns': columns, 'data_folder': data_folder, 'thermocouple': thermocouple,
+              'use_cache': use_cache, 'column_labels': column_labels}
+    jobs = [(key, kwargs) for key in keys]
+
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1) or 1
+    pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    with pool(max_workers=max_workers) as executor:
+        results = list(executor.map(_load_run_job, jobs))
+
+    runs = {}
+    for key, run, wall, cpu in results:
+        runs[key] = run
+        if profiler is not None:
+            profiler.record_key(key, wall, cpu, len(run))
+            profiler.add_rows(len(run))
+    return runs
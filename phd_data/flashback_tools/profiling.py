@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of the stages of the post-processing scripts.
+
+A ``Profiler`` records per stage the wall time, CPU time, peak of the traced
+Python and NumPy allocations (tracemalloc), the maximum resident set size and
+the number of rows processed. Stages can be nested (``with
+profiler.stage('load'):``) or, to fit the ``#%%`` cells of the scripts,
+switched with one line at the top of every cell (``profiler.switch('FB
+maps')``). Costs per run key, e.g. the loading time of every run, are
+recorded with ``record_key``.
+
+``save_json`` writes the full report, ``save_folded`` the folded stacks
+(``stage;substage;key microseconds``) that flamegraph.pl and speedscope read.
+A disabled profiler does nothing, so the calls can stay in the scripts.
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the maximum RSS is then not recorded
+    resource = None
+
+
+def max_rss_bytes():
+    """Maximum resident set size of this process so far, or None if unknown."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss*1024
+
+
+class _Frame:
+    # A running stage
+
+    def __init__(self, path, trace_memory):
+        self.path = path
+        self.rows = 0
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.memory = None
+        if trace_memory:
+            self.memory = tracemalloc.get_traced_memory()[0]
+            self.peak = self.memory
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+
+class Profiler:
+    """
+    Records the cost of the stages of a script.
+
+    With `trace_memory` tracemalloc is running while a stage is open, which
+    slows Python allocations down; switch it off to time only.
+    """
+
+    def __init__(self, enabled=True, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.keys = []
+        self._stack = []
+        self._started_tracing = False
+
+    def start(self, name):
+        """Open a stage, nested in the stage that is currently open."""
+        if not self.enabled:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self._stack and self._stack[-1].memory is not None:
+            # The new stage resets the peak, keep the peak of the parent so far
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        path = self._stack[-1].path + [name] if self._stack else [name]
+        self._stack.append(_Frame(path, self.trace_memory))
+
+    def stop(self):
+        """Close the innermost open stage and record it."""
+        if not self.enabled or not self._stack:
+            return
+        frame = self._stack.pop()
+        record = {'stage': frame.path[-1], 'path': ';'.join(frame.path),
+                  'wall_s': time.perf_counter() - frame.wall, 'cpu_s': time.process_time() - frame.cpu,
+                  'peak_traced_bytes': None, 'max_rss_bytes': max_rss_bytes(), 'rows': frame.rows}
+        if frame.memory is not None:
+            peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            record['peak_traced_bytes'] = peak - frame.memory
+            if self._stack:
+                # The peak of the parent includes this stage
+                self._stack[-1].peak = max(self._stack[-1].peak, peak)
+        self.stages.append(record)
+
+        if not self._stack and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def switch(self, name):
+        """Close the open stage at this level (if any) and open `name` next to it, for one-line use per cell."""
+        if not self.enabled:
+            return
+        if self._stack:
+            self.stop()
+        self.start(name)
+
+    def stop_all(self):
+        """Close all open stages."""
+        while self.enabled and self._stack:
+            self.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager around start and stop."""
+        self.start(name)
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def add_rows(self, n_rows):
+        """Add to the number of rows processed by the open stage."""
+        if self.enabled and self._stack:
+            self._stack[-1].rows += int(n_rows)
+
+    def record_key(self, key, wall_s, cpu_s=None, rows=None, stage=None):
+        """Record the cost of one run key within the open stage (or `stage`)."""
+        if not self.enabled:
+            return
+        if stage is None:
+            stage = ';'.join(self._stack[-1].path) if self._stack else ''
+        self.keys.append({'path': stage, 'key': list(key), 'wall_s': wall_s, 'cpu_s': cpu_s, 'rows': rows})
+
+    def report(self):
+        """The recorded stages and run keys as a dict, the most expensive run keys first."""
+        return {'stages': self.stages, 'keys': sorted(self.keys, key=lambda record: -record['wall_s'])}
+
+    def save_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+
+    def folded_stacks(self):
+        """
+        Lines 'stage;substage;key microseconds' with the self time of every
+        stage. The self time of a stage with recorded run keys is split over
+        the keys in proportion to their wall time, as the keys may have run in
+        parallel.
+        """
+        child_time, key_time = {}, {}
+        for record in self.stages:
+            parent = record['path'].rpartition(';')[0]
+            if parent:
+                child_time[parent] = child_time.get(parent, 0.0) + record['wall_s']
+        for record in self.keys:
+            key_time[record['path']] = key_time.get(record['path'], 0.0) + record['wall_s']
+
+        lines = []
+        self_times = {}
+        for record in self.stages:
+            self_time = max(record['wall_s'] - child_time.get(record['path'], 0.0), 0.0)
+            self_times[record['path']] = self_time
+            if not key_time.get(record['path']):
+                lines.append('{} {}'.format(record['path'], int(round(self_time*1e6))))
+        for record in self.keys:
+            total = key_time[record['path']] or 1.0
+            share = self_times.get(record['path'], total)*record['wall_s']/total
+            name = '_'.join(str(part) for part in record['key'])
+            path = record['path'] + ';' + name if record['path'] else name
+            lines.append('{} {}'.format(path, int(round(share*1e6))))
+        return lines
+
+    def save_folded(self, filename):
+        with open(filename, 'w') as f:
+            f.write('\n'.join(self.folded_stacks()) + '\n')
+
+    def summary(self):
+        """Short text table of the stages."""
+        lines = ['{:<40} {:>9} {:>9} {:>11} {:>10}'.format('stage', 'wall [s]', 'cpu [s]', 'peak [MB]', 'rows')]
+        for record in self.stages:
+            peak = record['peak_traced_bytes']
+            lines.append('{:<40} {:9.3f} {:9.3f} {:>11} {:10d}'.format(
+                record['path'][-40:], record['wall_s'], record['cpu_s'],
+                '-' if peak is None else '{:.1f}'.format(peak/1e6), record['rows']))
+        return '\n'.join(lines)
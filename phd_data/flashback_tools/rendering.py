@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Headless, parallel and cached rendering of the report figures.
+
+Every figure is an independent job: a builder function, the slice of data it
+shows and its plot settings. The builders use the object oriented matplotlib
+API on the Agg backend (no pyplot state, no global label flags), so the jobs
+can be rendered in a thread or process pool. ``show_figures`` draws the same
+jobs on pyplot figures for the interactive session, so every figure is
+defined once. Each PNG is keyed by a hash of its data
+slice, settings and the source of the builder module in
+``figures/.render_cache.json`` and only jobs whose hash changed are rendered
+again, e.g. adding an H75 run only redraws the H75
+figure and the FB maps, not the other per-hydrogen-content figures.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+from flashback_tools.decimation import plot_decimated
+from flashback_tools.event_windows import pooled_errorbars
+from flashback_tools.run_table import scatter_groups
+from flashback_tools.uncertainty import plot_ellipses
+
+# File in the figure folder with the hash of every rendered figure
+RENDER_CACHE = '.render_cache.json'
+
+# Bump when a change outside the builder modules (e.g. scatter_groups or
+# pooled_errorbars) changes the figures, all figures are then rendered again
+RENDER_VERSION = 1
+
+_module_digests = {}
+
+
+def _module_digest(module_name):
+    # SHA-1 of the source of a builder module, so editing a builder or its helpers invalidates its figures
+    if module_name not in _module_digests:
+        try:
+            source = inspect.getsource(sys.modules[module_name])
+        except (OSError, TypeError):
+            # Builders defined in an interactive session have no source file
+            source = ''
+        _module_digests[module_name] = hashlib.sha1(source.encode()).hexdigest()
+    return _module_digests[module_name]
+
+
+class FigureJob:
+    """
+    One figure of the report: builder(data, settings, fig=None) -> Figure,
+    saved as <name>.png. The builder draws on `fig` if given (e.g. a pyplot
+    figure), otherwise on a new Agg figure.
+    """
+
+    def __init__(self, name, builder, data, settings):
+        self.name = name
+        self.builder = builder
+        self.data = data
+        self.settings = settings
+
+    def digest(self):
+        """SHA-1 of the builder (name and module source), settings and data slice of the figure."""
+        sha1 = hashlib.sha1()
+        sha1.update(str(RENDER_VERSION).encode())
+        sha1.update(self.builder.__module__.encode() + b'.' + self.builder.__name__.encode())
+        sha1.update(_module_digest(self.builder.__module__).encode())
+        sha1.update(json.dumps(self.settings, sort_keys=True, default=str).encode())
+        for name in sorted(self.data):
+            sha1.update(name.encode())
+            sha1.update(_data_bytes(self.data[name]))
+        return sha1.hexdigest()
+
+
+def _data_bytes(data):
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        return repr(list(columns)).encode() + pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes()
+    return np.ascontiguousarray(data).tobytes()
+
+
+def _new_figure(settings, fig=None):
+    # A new Agg figure, or the given figure cleared
+    if fig is None:
+        fig = Figure(figsize=settings.get('figsize', (6.4, 4.8)))
+        FigureCanvasAgg(fig)
+    else:
+        fig.clear()
+    return fig, fig.add_subplot(111)
+
+
+def _finish_axes(ax, settings):
+    ax.set_xlabel(settings['xlabel'])
+    ax.set_ylabel(settings['ylabel'])
+    ax.set_xlim(*settings['xlim'])
+    ax.set_ylim(*settings['ylim'])
+    ax.grid(True, which='major', color='#666666', linestyle=settings.get('grid_linestyle', '--'), axis='both')
+    ax.set_title(settings['title'])
+
+
+def build_events_per_test(data, settings, fig=None):
+    """Operating points of one hydrogen content, colored by test nr with a marker per event (figures 1-5)."""
+    fig, ax = _new_figure(settings, fig)
+    scatter_groups(data['events'], 'phi_meas', 'u_u_meas', ['test_nr', 'event'],
+                   lambda group: {'color': settings['test_nr_colors'][group[0]],
+                                  'marker': settings['event_markers'][group[1]]}, ax=ax)
+    legend_markers = [Line2D([0], [0], marker=settings['event_markers'][event], color='w', label=label,
+                             markerfacecolor='k', markersize=12)
+                      for event, label in settings['event_labels'].items()]
+    ax.legend(handles=legend_markers)
+    _finish_axes(ax, settings)
+    return fig
+
+
+def build_events_per_H(data, settings, fig=None):
+    """FB propensity map (or u_u/S_L with settings y='u_u_S_L'), colored by hydrogen content (figures 6, 7 and 9)."""
+    fig, ax = _new_figure(settings, fig)
+    if 'pooled' in data:
+        pooled_errorbars(data['pooled'], colors=settings['H_colors'], ax=ax)
+    scatter_groups(data['events'], 'phi_meas', settings.get('y', 'u_u_meas'), 'hydrogen_percentage',
+                   lambda group: {'color': settings['H_colors'][group], 'marker': settings['marker'],
+                                  'label': settings['H_labels'][group]}, ax=ax)
+    ax.legend()
+    _finish_axes(ax, settings)
+    return fig
+
+
+def build_events_colored(data, settings, fig=None):
+    """FB propensity map, colored by a measured quantity (figures 8, 10 and 11)."""
+    fig, ax = _new_figure(settings, fig)
+    events = data['events']
+    if 'pooled' in data:
+        pooled_errorbars(data['pooled'], ax=ax)
+    sc = ax.scatter(events['phi_meas'], events['u_u_meas'], c=events[settings['color_column']], cmap='coolwarm',
+                    vmin=settings['vmin'], vmax=settings['vmax'])
+    cbar = fig.colorbar(sc, ax=ax)
+    cbar.set_label(settings['color_label'])
+    _finish_axes(ax, settings)
+    return fig
+
+
+def build_campaign_map(data, settings, fig=None):
+    """FB propensity map of several liner sets: colored by hydrogen content, a marker per liner set."""
+    fig, ax = _new_figure(settings, fig)
+    markers = settings['liner_set_markers']
+    if 'pooled' in data:
+        pooled_errorbars(data['pooled'], colors=settings['H_colors'], ax=ax)
+    scatter_groups(data['events'], 'phi_meas', 'u_u_meas', ['liner_set', 'hydrogen_percentage'],
+                   lambda group: {'color': settings['H_colors'][group[1]], 'marker': markers[group[0]]}, ax=ax)
+
+    H_values = sorted(set(data['events'].index.get_level_values('hydrogen_percentage')), key=lambda H: int(H.lstrip('H')))
+    handles = [Line2D([0], [0], marker='o', color='w', markerfacecolor=settings['H_colors'][H], markersize=8,
+                      label='H2% = ' + H.lstrip('H')) for H in H_values]
+    handles += [Line2D([0], [0], marker=marker, color='w', markerfacecolor='k', markersize=8, label=liner_set)
+                for liner_set, marker in markers.items()]
+    ax.legend(handles=handles, fontsize='small')
+    _finish_axes(ax, settings)
+    return fig
+
+
+def build_time_series(data, settings, fig=None):
+    """
+    Measured quantities of one run against the frame index, labelled with the
+    first and last time stamp (figures 12 and 13). Lines are min/max decimated
+    to the pixel width of the axes (again on zooming, see plot_decimated).
+    """
+    fig, ax = _new_figure(settings, fig)
+    series = data['series']
+    frames = np.arange(len(series))
+    for label, (numerator, denominator) in settings['lines'].items():
+        values = series[numerator].to_numpy()
+        if denominator is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = values/series[denominator].to_numpy()
+        plot_decimated(ax, frames, values, label=label)
+    ax.set_xlim(0, len(frames))
+    ax.set_xticks([0, len(frames) - 1])
+    ax.set_xticklabels([series['time'].iloc[0], series['time'].iloc[-1]])
+    ax.legend()
+    return fig
+
+
+def build_thermocouples(data, settings, fig=None):
+    """
+    Thermocouple temperatures of one run against the time since the start of
+    the main log (figure 14), min/max decimated to the pixel width.
+    """
+    fig, ax = _new_figure(settings, fig)
+    series = data['series']
+    time_s = series['time_s'].to_numpy()
+    for tc_name in series.columns.drop('time_s'):
+        plot_decimated(ax, time_s, series[tc_name].to_numpy(), label=tc_name)
+    ax.set_xlabel('Time since start of run [s]')
+    ax.set_ylabel('Temperature [C]')
+    ax.legend()
+    return fig
+
+
+def build_uncertainty_map(data, settings, fig=None):
+    """FB propensity map with the confidence ellipses of the flow meter errors (figure 15)."""
+    fig, ax = _new_figure(settings, fig)
+    plot_ellipses(data['ellipses'], colors=settings['H_colors'], ax=ax)
+    scatter_groups(data['events'], 'phi_meas', 'u_u_meas', 'hydrogen_percentage',
+                   lambda group: {'color': settings['H_colors'][group], 'marker': settings['marker'],
+                                  'label': settings['H_labels'][group]}, ax=ax)
+    ax.legend()
+    _finish_axes(ax, settings)
+    return fig
+
+
+def _render_job(job, figure_folder, dpi):
+    fig = job.builder(job.data, job.settings)
+    fig.savefig(os.path.join(figure_folder, job.name + '.png'), dpi=dpi)
+    return job.name
+
+
+def _read_render_cache(figure_folder):
+    cache_file = os.path.join(figure_folder, RENDER_CACHE)
+    if not os.path.isfile(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def render_figures(jobs, figure_folder='figures', dpi=100, max_workers=None, use_processes=False, force=False):
+    """
+    Render the figure jobs that changed since the previous call to PNG files.
+
+    Jobs whose hash is in the render cache and whose PNG exists are skipped,
+    unless `force` is set. The other jobs are rendered in a thread pool by
+    default, as in loader.load_runs: the post-processing scripts are Spyder
+    cell scripts without a ``__main__`` guard, and under the spawn start
+    method (Windows, macOS) process workers import the calling script again.
+    Agg draws with the GIL held, so the threads render mostly one after
+    another; for a parallel speed-up pass `use_processes=True` from guarded
+    code, as benchmark does. Returns the names of the rendered figures.
+    """
+    os.makedirs(figure_folder, exist_ok=True)
+    render_cache = _read_render_cache(figure_folder)
+
+    digests = {job.name: job.digest() for job in jobs}
+    todo = [job for job in jobs
+            if force or render_cache.get(job.name) != digests[job.name]
+            or not os.path.isfile(os.path.join(figure_folder, job.name + '.png'))]
+
+    rendered = []
+    if todo:
+        if max_workers is None:
+            max_workers = min(len(todo), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool(max_workers=max_workers) as executor:
+            futures = [executor.submit(_render_job, job, figure_folder, dpi) for job in todo]
+            rendered = [future.result() for future in futures]
+
+    render_cache.update({name: digests[name] for name in rendered})
+    with open(os.path.join(figure_folder, RENDER_CACHE), 'w') as f:
+        json.dump(render_cache, f, indent=1, sort_keys=True)
+    return rendered
+
+
+def show_figures(jobs):
+    """
+    Draw the figure jobs on pyplot figures, labelled with the job names, for
+    the interactive session. Returns a dict job name -> Figure.
+    """
+    return {job.name: job.builder(job.data, job.settings, fig=plt.figure(job.name)) for job in jobs}
+
+
+def report_jobs(event_table, time_series, plot_settings, pooled=None, thermocouples=None, ellipses=None):
+    """
+    Figure jobs of the flashback report (figures 1-15 of the post-processing script).
+
+    `event_table` comes from build_event_table (with the columns phi_meas,
+    u_u_meas, power_meas and Q_a1_meas), `time_series` is the DataFrame of
+    the run shown in figures 12 and 13 (columns time, Q_a1_meas, Q_H2_meas
+    and Q_DNG_meas) and `plot_settings` holds the colors, labels, titles,
+    markers and axis limits of the script. With a `pooled` table (see
+    event_windows.pool_repeats) the FB maps get error bars of the repeated tests.
+    Figure 9 (u_u/S_L at FB) is added when the event table has a u_u_S_L
+    column with values.
+    Figure 14 needs `thermocouples`, a DataFrame with the column time_s and
+    a column per thermocouple, and figure 15 the confidence ellipses of the
+    FB events (see uncertainty.confidence_ellipses); without them these
+    figures are left out.
+    """
+    s = plot_settings
+    event_labels = {'design': 'Design point (stable operation)', 'first_sign_FB': 'First sign of FB', 'FB': 'FB'}
+    FB_map = {'xlabel': '$\\phi$ [-]', 'ylabel': '$u_{u,{FB}}$ [m/s]', 'xlim': [0.25, 1.1], 'ylim': [0, 9.00],
+              'title': 'Flashback propensity map for multiple mixtures'}
+    design_data = {'events': event_table.xs('design', level='event', drop_level=False)}
+    FB_data = {'events': event_table.xs('FB', level='event', drop_level=False)}
+    if pooled is not None:
+        design_data['pooled'] = pooled.xs('design', level='event', drop_level=False)
+        FB_data['pooled'] = pooled.xs('FB', level='event', drop_level=False)
+
+    jobs = []
+    for hydrogen_percentage in s['H_limits']:
+        x_lim_left, x_lim_right, y_lim = s['H_limits'][hydrogen_percentage]
+        events = event_table[event_table.index.get_level_values('hydrogen_percentage') == hydrogen_percentage]
+        settings = {'xlabel': '$\\phi$ [-]', 'ylabel': 'Unburned mixture bulk velocity $u_u$ [m/s]',
+                    'xlim': [x_lim_left, x_lim_right], 'ylim': [0, y_lim], 'title': s['H_titles'][hydrogen_percentage],
+                    'test_nr_colors': s['test_nr_colors'], 'event_markers': s['event_markers'],
+                    'event_labels': event_labels}
+        jobs.append(FigureJob('u_u_phi_' + hydrogen_percentage, build_events_per_test, {'events': events}, settings))
+
+    per_H = dict(FB_map, H_colors=s['H_colors'], H_labels=s['H_labels'], marker=s['event_markers']['FB'])
+    jobs.append(FigureJob('fb_map', build_events_per_H, FB_data, per_H))
+    jobs.append(FigureJob('fb_map_design', build_events_per_H, design_data, per_H))
+
+    power = dict(FB_map, grid_linestyle='-', color_column='power_meas', color_label='Thermal power output [kW]', vmin=0, vmax=20)
+    air_flow = dict(FB_map, grid_linestyle='-', color_column='Q_a1_meas', color_label='Air flow 1 [Ln/min]', vmin=0, vmax=1000)
+    if 'u_u_S_L' in event_table and FB_data['events']['u_u_S_L'].notna().any():
+        ratio_max = FB_data['events']['u_u_S_L'].max()
+        u_u_S_L = dict(per_H, y='u_u_S_L', ylabel='$u_{u,{FB}}/S_L$ [-]', ylim=[0, 1.1*ratio_max],
+                       title='Flashback velocity over laminar flame speed')
+        jobs.append(FigureJob('fb_map_u_u_S_L', build_events_per_H, {'events': FB_data['events']}, u_u_S_L))
+    jobs.append(FigureJob('fb_map_power', build_events_colored, FB_data, power))
+    jobs.append(FigureJob('fb_map_power_design', build_events_colored, design_data, power))
+    jobs.append(FigureJob('fb_map_air_flow_1', build_events_colored, FB_data, air_flow))
+
+    flows = {'lines': {'Q_air': ('Q_a1_meas', None), 'Q_H2': ('Q_H2_meas', None), 'Q_DNG': ('Q_DNG_meas', None)}}
+    ratio = {'lines': {'Q_air/Q_H2': ('Q_a1_meas', 'Q_H2_meas')}}
+    jobs.append(FigureJob('flows_time', build_time_series, {'series': time_series}, flows))
+    jobs.append(FigureJob('air_H2_ratio_time', build_time_series, {'series': time_series}, ratio))
+
+    if thermocouples is not None:
+        jobs.append(FigureJob('thermocouples_time', build_thermocouples, {'series': thermocouples}, {}))
+    if ellipses is not None:
+        uncertainty = dict(per_H, title='Flashback propensity map with 95% confidence ellipses')
+        jobs.append(FigureJob('fb_map_uncertainty', build_uncertainty_map,
+                              {'events': FB_data['events'], 'ellipses': ellipses}, uncertainty))
+    return jobs
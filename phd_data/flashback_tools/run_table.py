@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tidy table of the operating points at the flashback events of all runs.
+
+``build_event_table`` turns ``flashback_data`` (run key -> [frame index design
+point, first sign of FB, FB]) into one long DataFrame indexed by
+(hydrogen_percentage, phi, test_nr, date, event) with the measured columns at
+those frames. Only the event rows are gathered from every run, a frame index
+outside its run raises an IndexError naming the run. ``scatter_groups`` draws such a
+table with one scatter artist per group instead of one artist per point.
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from flashback_tools.columns import column_index
+from flashback_tools.frame_index import get_frames
+
+# Event types, in the order of the frame indices in flashback_data
+EVENT_TYPES = ['design', 'first_sign_FB', 'FB']
+
+INDEX_NAMES = ['hydrogen_percentage', 'phi', 'test_nr', 'date', 'event']
+
+# Default columns of the event table
+EVENT_COLUMNS = ['phi_meas', 'u_u_meas', 'power_meas', 'Q_a1_meas', 'Q_DNG_meas', 'Q_H2_meas']
+
+
+def event_frames(flashback_data):
+    """
+    Flatten flashback_data into (run keys, event types, frame indices).
+
+    Events without a frame index (None) are left out.
+    """
+    keys, events, frames = [], [], []
+    for key, value in flashback_data.items():
+        for event, frame in zip(EVENT_TYPES, value[:len(EVENT_TYPES)]):
+            if frame is not None:
+                keys.append(key)
+                events.append(event)
+                frames.append(frame)
+    return keys, events, np.array(frames, dtype=np.int64)
+
+
+def _event_index(keys, events):
+    tuples = [tuple(key[:4]) + (event,) for key, event in zip(keys, events)]
+    return pd.MultiIndex.from_tuples(tuples, names=INDEX_NAMES)
+
+
+def _run_labels(run, columns):
+    # Runs may be labelled by variable name or by column index
+    return [column if column in run.columns else column_index(column) for column in columns]
+
+
+def run_values(run, columns, rows=None):
+    """
+    (n_rows, n_columns) float64 array of the columns of a run DataFrame or
+    CompactRun, of all rows or of the positions in `rows`.
+    """
+    if isinstance(run, pd.DataFrame):
+        data = run[_run_labels(run, columns)]
+        if rows is not None:
+            data = data.iloc[rows]
+        return data.to_numpy(dtype=np.float64)
+    if rows is None:
+        return run.to_numpy(columns)
+    return np.column_stack([np.asarray(run[column], dtype=np.float64)[rows] for column in columns])
+
+
+def check_frames(key, frames, n_rows):
+    """Raise an IndexError if a frame index is outside a run of `n_rows` frames."""
+    frames = np.asarray(frames)
+    outside = frames[(frames < 0) | (frames >= n_rows)]
+    if len(outside):
+        raise IndexError('Frame index %s is outside run %s with %d frames' % (outside[0], key, n_rows))
+
+
+def build_event_table(flashback_data, runs=None, columns=EVENT_COLUMNS, data_folder='.'):
+    """
+    Measured values at the design, first sign of FB and FB frames of all runs.
+
+    `runs` is a dict run key -> DataFrame (e.g. from load_runs) or CompactRun
+    (from load_compact_runs). When None,
+    only the event frames are read from the data files (see get_frames).
+    Returns a DataFrame indexed by (hydrogen_percentage, phi, test_nr, date,
+    event) with one column per name in `columns`, plus the integer 'H2'
+    (hydrogen percentage) and the 'frame' index. Raises an IndexError when
+    a frame index is outside its run.
+    """
+    columns = list(columns)
+    keys, events, frames = event_frames(flashback_data)
+
+    values = np.empty((len(frames), len(columns)))
+    rows = {}
+    for i, key in enumerate(keys):
+        rows.setdefault(key, []).append(i)
+
+    for key, key_rows in rows.items():
+        key_frames = frames[key_rows]
+        if runs is None:
+            data = get_frames(key, key_frames, columns, data_folder)
+            values[key_rows] = data.loc[key_frames].to_numpy()
+        else:
+            # Only the event rows of the run are gathered
+            check_frames(key, key_frames, len(runs[key]))
+            values[key_rows] = run_values(runs[key], columns, key_frames)
+
+    table = pd.DataFrame(values, index=_event_index(keys, events), columns=columns)
+    table['H2'] = [int(key[0].lstrip('H')) for key in keys]
+    table['frame'] = frames
+    return table
+
+
+def scatter_groups(table, x, y, by, style, ax=None, **kwargs):
+    """
+    Scatter plot of an event table with one artist per group.
+
+    `by` is a (list of) index level or column name(s) and `style` a function
+    that maps a group key to keyword arguments for ``ax.scatter`` (color,
+    marker, label, ...), or None to skip the group. Groups are drawn in
+    sorted order, with the hydrogen percentage sorted numerically.
+    Returns the list of artists.
+    """
+    if ax is None:
+        ax = plt.gca()
+
+    data = table.reset_index()
+    by_list = [by] if isinstance(by, str) else list(by)
+    sort_columns = ['H2' if column == 'hydrogen_percentage' else column for column in by_list]
+
+    artists = []
+    for group, group_data in data.sort_values(sort_columns, kind='stable').groupby(by_list, sort=False):
+        if isinstance(by, str) and isinstance(group, tuple):
+            group = group[0]
+        group_style = style(group)
+        if group_style is None:
+            continue
+        group_style = dict(kwargs, **group_style)
+        artists.append(ax.scatter(group_data[x].to_numpy(), group_data[y].to_numpy(), **group_style))
+    return artists
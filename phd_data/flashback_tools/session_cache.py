@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar on-disk cache for the LabVIEW session logs.
+
+Every ``session_*/H*_phi=*_test*.txt`` file (and its ``_tc.txt`` companion)
+is parsed once with ``pd.read_csv`` and written as one ``.npy`` file per
+column to a hidden ``.cache`` folder inside the session directory:
+
+    session_2020-07-28/.cache/H0_phi=0.70_u1=x_2020-07-28_test1/
+        meta.json       source size, mtime and SHA-1, column dtypes
+        col_00.npy      time stamps as fixed width bytes ('S12')
+        col_01.npy      ... one float64 array per measured column
+        time_ms.npy     time stamps as int64 milliseconds since midnight
+
+The cache is invalidated when the size of the source file changes. When only
+the modification time changes (e.g. after a fresh checkout) the SHA-1 of the
+file is compared before the cache is rebuilt.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.columns import column_dtypes
+
+# Bump when the layout of the cache changes, old caches are then rebuilt
+CACHE_VERSION = 1
+
+# Name of the hidden cache folder inside each session directory
+CACHE_FOLDER = '.cache'
+
+# Length of a 'hh:mm:ss.xxx' time stamp
+TIME_STAMP_LENGTH = 12
+
+
+def time_to_ms(stamps):
+    """
+    Convert 'hh:mm:ss.xxx' time stamps to int64 milliseconds since midnight.
+
+    The conversion works on the raw bytes of the fixed width stamps, so no
+    Python level loop over the samples is involved.
+    """
+    stamps = np.asarray(stamps).astype('S%d' % TIME_STAMP_LENGTH)
+
+    digits = stamps.view(np.uint8).reshape(-1, TIME_STAMP_LENGTH).astype(np.int64) - ord('0')
+    hours = 10*digits[:, 0] + digits[:, 1]
+    minutes = 10*digits[:, 3] + digits[:, 4]
+    seconds = 10*digits[:, 6] + digits[:, 7]
+    milliseconds = 100*digits[:, 9] + 10*digits[:, 10] + digits[:, 11]
+
+    return ((hours*60 + minutes)*60 + seconds)*1000 + milliseconds
+
+
+def ms_to_time(time_ms):
+    """Convert milliseconds since midnight to 'hh:mm:ss.xxx' time stamps (the inverse of time_to_ms)."""
+    time_ms = np.asarray(time_ms, dtype=np.int64) % (24*3600*1000)
+    hours, rest = np.divmod(time_ms, 3600*1000)
+    minutes, rest = np.divmod(rest, 60*1000)
+    seconds, milliseconds = np.divmod(rest, 1000)
+
+    digits = np.stack([hours//10, hours % 10, minutes//10, minutes % 10, seconds//10, seconds % 10,
+                       milliseconds//100, milliseconds//10 % 10, milliseconds % 10], axis=-1)
+    stamps = np.full(time_ms.shape + (TIME_STAMP_LENGTH,), ord(':'), dtype=np.uint8)
+    stamps[..., [0, 1, 3, 4, 6, 7, 9, 10, 11]] = digits + ord('0')
+    stamps[..., 8] = ord('.')
+    return stamps.view('S%d' % TIME_STAMP_LENGTH)[..., 0].astype(str)
+
+
+def cache_dir(filename):
+    """Return the cache directory belonging to a session data file."""
+    data_dir, basename = os.path.split(os.path.abspath(filename))
+    stem = os.path.splitext(basename)[0]
+    return os.path.join(data_dir, CACHE_FOLDER, stem)
+
+
+def file_hash(filename, block_size=1 << 20):
+    """SHA-1 of the content of a file."""
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_meta(filename):
+    """Return the cache metadata of a data file, or None if there is no cache."""
+    meta_file = os.path.join(cache_dir(filename), 'meta.json')
+    if not os.path.isfile(meta_file):
+        return None
+    with open(meta_file) as f:
+        return json.load(f)
+
+
+def _write_meta(filename, meta):
+    meta_file = os.path.join(cache_dir(filename), 'meta.json')
+    tmp_file = meta_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_file, meta_file)
+
+
+def is_cache_valid(filename):
+    """
+    Check whether the cache of a data file is up to date.
+
+    A changed modification time with an unchanged size and SHA-1 still counts
+    as valid, the new modification time is then stored in the cache.
+    """
+    meta = read_meta(filename)
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+
+    stat = os.stat(filename)
+    if stat.st_size != meta['size']:
+        return False
+    if stat.st_mtime_ns == meta['mtime_ns']:
+        return True
+
+    if file_hash(filename) != meta['sha1']:
+        return False
+    meta['mtime_ns'] = stat.st_mtime_ns
+    _write_meta(filename, meta)
+    return True
+
+
+def count_columns(filename):
+    """Number of comma separated columns in the first line of a data file."""
+    with open(filename) as f:
+        return f.readline().count(',') + 1
+
+
+def build_cache(filename):
+    """Parse a data file with pandas and write its columnar cache."""
+    stat = os.stat(filename)
+    data = pd.read_csv(filename, header=None, dtype=column_dtypes(count_columns(filename)))
+
+    directory = cache_dir(filename)
+    os.makedirs(directory, exist_ok=True)
+
+    dtypes = {}
+    for column in data.columns:
+        values = data[column].to_numpy()
+        if column == 0:
+            values = values.astype('S%d' % TIME_STAMP_LENGTH)
+        np.save(os.path.join(directory, 'col_%02d.npy' % column), values)
+        dtypes[str(column)] = values.dtype.str
+    np.save(os.path.join(directory, 'time_ms.npy'), time_to_ms(data[0].to_numpy()))
+
+    # The metadata is written last, a cache without it is never used
+    meta = {'version': CACHE_VERSION,
+            'source': os.path.basename(filename),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_hash(filename),
+            'n_rows': len(data),
+            'n_columns': len(data.columns),
+            'dtypes': dtypes}
+    _write_meta(filename, meta)
+    return meta
+
+
+def ensure_cache(filename):
+    """Build the cache of a data file if it is missing or outdated, return its metadata."""
+    if not is_cache_valid(filename):
+        return build_cache(filename)
+    return read_meta(filename)
+
+
+def load_column(filename, column, mmap_mode='r'):
+    """
+    Return one column of a data file as a (memory mapped) NumPy array.
+
+    `column` is a column index or 'time_ms'.
+    """
+    ensure_cache(filename)
+    return _load_cached_column(cache_dir(filename), column, mmap_mode)
+
+
+def load_columns(filename, columns, mmap_mode='r'):
+    """
+    Several columns of a data file as a dict column -> (memory mapped) NumPy
+    array, the cache is validated once for all of them.
+    """
+    ensure_cache(filename)
+    directory = cache_dir(filename)
+    return {column: _load_cached_column(directory, column, mmap_mode) for column in columns}
+
+
+def _load_cached_column(directory, column, mmap_mode):
+    if column == 'time_ms':
+        name = 'time_ms.npy'
+    else:
+        name = 'col_%02d.npy' % column
+    return np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+
+
+def read_session_file(filename, columns=None):
+    """
+    Drop-in replacement for ``pd.read_csv(filename, header=None)``.
+
+    Columns are labelled by their index like in the plain pandas call, the
+    time column holds the original 'hh:mm:ss.xxx' strings. Use `columns` to
+    load only a subset of the column indices.
+    """
+    meta = ensure_cache(filename)
+    if columns is None:
+        columns = range(meta['n_columns'])
+
+    directory = cache_dir(filename)
+    data = {}
+    for column in columns:
+        values = _load_cached_column(directory, column, None)
+        if column == 0:
+            values = values.astype(str).astype(object)
+        data[column] = values
+    return pd.DataFrame(data, columns=list(columns))
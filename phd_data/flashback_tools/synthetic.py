@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic liner sets for benchmarking the post-processing pipeline.
+
+``generate_liner_set`` writes ``session_YYYY-MM-DD/H*_phi=*_u1=x_*_test*.txt``
+main logs (27 columns) and ``_tc.txt`` thermocouple logs (7 columns) in the
+layout and number format of the LabVIEW control panel, for any number of
+runs and rows per run. Every run follows the protocol of the real ones: the
+velocity set point is lowered in steps at constant phi until flashback, after
+which the fuel is shut off. Flows, mass flows, power and density follow from
+u_u and phi with the relations of the control panel, the liner thermocouples
+heat up slowly and rise steeply at flashback. The frame indices of the design
+point, first sign of FB and FB are returned like ``flashback_data``.
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+from flashback_tools.session_cache import ms_to_time
+
+# Sample interval of the main and thermocouple logs [s]
+MAIN_INTERVAL_S = 0.215
+TC_INTERVAL_S = 0.286
+
+# Hydrogen percentages and equivalence ratios of the runs, as in steel liner set 1
+SYNTHETIC_PHI = {'H0': ['0.60', '0.70', '0.80', '0.90', '1.00'],
+                 'H25': ['0.50', '0.60', '0.70', '0.80', '0.90'],
+                 'H50': ['0.50', '0.60', '0.70', '0.80', '0.90'],
+                 'H75': ['0.40', '0.50', '0.60', '0.70'],
+                 'H100': ['0.30', '0.35', '0.40', '0.45', '0.50']}
+
+# Constants of the control panel: DNG composition, burner geometry [mm] and LHVs
+DNG = {'CH4': 0.8187, 'C2H6': 0.0373, 'N2': 0.144}
+GEOMETRY = (83.8, 74.0, 146.7)
+LHV = {'H2': 120e6, 'CH4': 50e6, 'C2H6': 50e6}
+
+# Normal densities [kg/m^3n] and stoichiometric air [mol air/mol fuel]
+RHO_N = {'air': 1.293, 'H2': 0.0899, 'CH4': 0.717, 'C2H6': 1.356, 'N2': 1.25}
+AIR_STOICHIOMETRIC = {'H2': 2.38, 'CH4': 9.52, 'C2H6': 16.66}
+
+# Normal volume flow of the unburned mixture per unit bulk velocity [ln/min per m/s]
+Q_PER_VELOCITY = 68.0
+
+
+def synthetic_keys(n_runs, runs_per_session=30, first_date='2020-07-28'):
+    """
+    Run keys (hydrogen percentage, phi, test nr, date) of `n_runs` runs.
+
+    The runs cycle through the hydrogen percentages and equivalence ratios of
+    SYNTHETIC_PHI, `runs_per_session` runs per day; repeated runs of the same
+    mixture on one day get increasing test numbers.
+    """
+    mixtures = [(H, phi) for H, phis in SYNTHETIC_PHI.items() for phi in phis]
+    start = datetime.date.fromisoformat(first_date)
+    keys, test_nrs = [], {}
+    for i in range(n_runs):
+        date = str(start + datetime.timedelta(days=i//runs_per_session))
+        H, phi = mixtures[i % len(mixtures)]
+        test_nr = test_nrs.get((H, phi, date), 0) + 1
+        test_nrs[(H, phi, date)] = test_nr
+        keys.append((H, phi, str(test_nr), date))
+    return keys
+
+
+def _time_stamps(start_s, n, interval_s, rng):
+    # 'hh:mm:ss.xxx' time stamps with some jitter on the sample interval
+    return ms_to_time(np.round(1000*(start_s + np.cumsum(interval_s*rng.uniform(0.95, 1.05, n)))).astype(np.int64))
+
+
+def _write_log(filename, stamps, values):
+    body = np.char.mod('%.4f', values)
+    lines = stamps
+    for column in range(values.shape[1]):
+        lines = np.char.add(np.char.add(lines, ','), body[:, column])
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines.tolist()) + '\n')
+
+
+def synthetic_run(key, n_rows, rng, start_s=12*3600.0):
+    """
+    Main log values (n_rows x 26, without the time column), thermocouple log
+    values, both time stamp arrays and the event frames [design, first sign
+    of FB, FB] of one synthetic run.
+    """
+    H, phi = key[0], float(key[1])
+    x_H2 = int(H.lstrip('H'))/100
+    n = n_rows
+
+    # Events: design point early on, FB near the end, then the fuel is shut off
+    design = int(n*rng.uniform(0.08, 0.15))
+    FB = int(n*rng.uniform(0.85, 0.92))
+    first_sign_FB = int(FB - n*rng.uniform(0.1, 0.3))
+    fuel_off = min(FB + max(int(n*0.02), 5), n)
+
+    # Velocity set point: a ramp down to the design point, then steps of 0.25 m/s every ~200 frames
+    u_design = rng.uniform(2.0, 8.0)*(1 + x_H2)/2
+    u_u_set = np.full(n, u_design)
+    u_u_set[:design] = np.linspace(u_design*1.4, u_design, design)
+    steps = np.arange(n) - design
+    u_u_set[design:] -= 0.25*np.clip(steps[design:]//200, 0, None)
+    u_u_set = np.maximum(np.round(u_u_set/0.05)*0.05, 0.5)
+    u_u_meas = u_u_set*(1 + rng.normal(0, 0.002, n))
+    phi_meas = phi*(1 + rng.normal(0, 0.003, n))
+    phi_meas[fuel_off:] = 0.0
+
+    # Flows [ln/min] from the stoichiometric air of the fuel blend
+    air_st = x_H2*AIR_STOICHIOMETRIC['H2'] + (1 - x_H2)*(DNG['CH4']*AIR_STOICHIOMETRIC['CH4'] + DNG['C2H6']*AIR_STOICHIOMETRIC['C2H6'])
+    Q_mix = Q_PER_VELOCITY*u_u_meas
+    Q_fuel = np.where(phi_meas > 0, Q_mix/(1 + air_st/np.maximum(phi_meas, 1e-9)), 0.0)
+    Q_a1 = Q_mix - Q_fuel
+    Q_a2 = Q_a1*(1 + rng.normal(0, 0.002, n))
+    x_H2_meas = np.full(n, x_H2)
+    Q_H2 = x_H2_meas*Q_fuel
+    Q_DNG = Q_fuel - Q_H2
+
+    # Mass flows [kg/s], power [kW] and unburned density [kg/m^3]
+    rho_DNG = DNG['CH4']*RHO_N['CH4'] + DNG['C2H6']*RHO_N['C2H6'] + DNG['N2']*RHO_N['N2']
+    m_a = Q_a1/60000*RHO_N['air']
+    m_f = (Q_H2*RHO_N['H2'] + Q_DNG*rho_DNG)/60000
+    m_mix = m_a + m_f
+    power = (Q_H2*RHO_N['H2']*LHV['H2'] + Q_DNG*(DNG['CH4']*RHO_N['CH4']*LHV['CH4'] +
+                                               DNG['C2H6']*RHO_N['C2H6']*LHV['C2H6']))/60000/1000
+    T_u = np.round(rng.uniform(293.0, 296.0)/0.05)*0.05
+    p_u = np.round(rng.uniform(101000.0, 102500.0), -1)
+    rho_u = m_mix/(Q_mix/60000)*273.15/T_u*p_u/101325
+
+    ones = np.ones(n)
+    main = np.column_stack([T_u*ones, p_u*ones, x_H2*ones, DNG['CH4']*ones, DNG['C2H6']*ones, DNG['N2']*ones,
+                            GEOMETRY[0]*ones, GEOMETRY[1]*ones, GEOMETRY[2]*ones, phi*ones, u_u_set,
+                            phi_meas, u_u_meas, x_H2_meas, Q_a1, Q_a2, Q_DNG, Q_H2,
+                            m_mix, m_a, m_f, power, rho_u, LHV['H2']*ones, LHV['CH4']*ones, LHV['C2H6']*ones])
+
+    # Thermocouples: liner channels heat up slowly, faster after the first sign and steeply at FB
+    n_tc = int(n*MAIN_INTERVAL_S/TC_INTERVAL_S)
+    t_tc = np.arange(n_tc)*TC_INTERVAL_S
+    t_first_sign, t_FB = first_sign_FB*MAIN_INTERVAL_S, FB*MAIN_INTERVAL_S
+    heating = 250*(1 - np.exp(-t_tc/400)) + 0.5*np.clip(t_tc - t_first_sign, 0, None)
+    heating += 300*(1 - np.exp(-np.clip(t_tc - t_FB, 0, None)/5))
+    liner = 70 + heating[:, np.newaxis]*rng.uniform(0.6, 1.2, 4) + rng.normal(0, 0.3, (n_tc, 4))
+    exhaust = 400 + 400*(1 - np.exp(-t_tc/60))[:, np.newaxis]*rng.uniform(0.9, 1.1, 2) + rng.normal(0, 1, (n_tc, 2))
+    tc = np.column_stack([liner, exhaust])
+
+    stamps = _time_stamps(start_s, n, MAIN_INTERVAL_S, rng)
+    stamps_tc = _time_stamps(start_s + 0.2, n_tc, TC_INTERVAL_S, rng)
+    return main, tc, stamps, stamps_tc, [design, first_sign_FB, FB]
+
+
+def generate_liner_set(data_folder, n_runs=121, n_rows=2000, runs_per_session=30, seed=0):
+    """
+    Write a synthetic liner set of `n_runs` runs of `n_rows` frames each to
+    `data_folder` (session directories with main and thermocouple logs).
+
+    Returns a dict run key -> [design, first sign of FB, FB] frame index,
+    the same structure as ``flashback_data`` in the post-processing scripts.
+    """
+    rng = np.random.default_rng(seed)
+    flashback_data = {}
+    start_s = {}
+    for key in synthetic_keys(n_runs, runs_per_session):
+        hydrogen_percentage, phi, test_nr, date = key
+        session_dir = os.path.join(data_folder, 'session_' + date)
+        os.makedirs(session_dir, exist_ok=True)
+        # Runs of one day follow each other, starting at 9:00
+        start = start_s.get(date, 9*3600.0)
+        main, tc, stamps, stamps_tc, events = synthetic_run(key, n_rows, rng, start)
+        start_s[date] = start + n_rows*MAIN_INTERVAL_S + 120
+
+        stem = os.path.join(session_dir, hydrogen_percentage + '_phi=' + phi + '_u1=x_' + date + '_test' + test_nr)
+        _write_log(stem + '.txt', stamps, main)
+        _write_log(stem + '_tc.txt', stamps_tc, tc)
+        flashback_data[key] = events
+    return flashback_data
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Thermocouple logs (``*_tc.txt``) aligned in time with the main session log.
+
+The main log is sampled every ~200 ms and the thermocouple log every
+~285 ms, both with 'hh:mm:ss.xxx' stamps. The stamps are converted to int64
+milliseconds, unwrapped at midnight and the 6 thermocouple channels are
+joined to the rows of the main log, either by nearest time stamp
+(``pd.merge_asof``) or by linear interpolation (``np.interp``). Both are bulk
+operations, there is no loop over the samples.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from flashback_tools.columns import tc_variables_list
+from flashback_tools.loader import load_run, run_filename
+from flashback_tools.session_cache import load_column
+
+# Milliseconds in a day
+DAY_MS = 24*60*60*1000
+
+
+def unwrap_midnight(time_ms):
+    """
+    Make time stamps in ms since midnight monotonic over midnight.
+
+    Every backward jump of more than half a day is taken as a midnight
+    rollover and a day is added to all following samples.
+    """
+    time_ms = np.asarray(time_ms, dtype=np.int64)
+    rollovers = np.concatenate(([0], np.cumsum(np.diff(time_ms) < -DAY_MS//2)))
+    return time_ms + rollovers*DAY_MS
+
+
+def run_time_ms(key, data_folder='.', thermocouple=False):
+    """Unwrapped time stamps [ms] of the main (or thermocouple) log of a run."""
+    filename = run_filename(key, data_folder, thermocouple)
+    return unwrap_midnight(load_column(filename, 'time_ms', mmap_mode=None))
+
+
+def align_streams(time_main, time_tc, tc_values, method='nearest', tolerance_ms=None):
+    """
+    Sample thermocouple channels at the time stamps of the main log.
+
+    `time_main` and `time_tc` are unwrapped time stamps [ms] and `tc_values`
+    a (n_tc, n_channels) array. With method 'nearest' the closest sample is
+    taken (NaN when further away than `tolerance_ms`), with 'interpolate'
+    the channels are interpolated linearly (NaN outside the thermocouple log).
+    Returns a (n_main, n_channels) float64 array.
+    """
+    time_main = np.asarray(time_main, dtype=np.int64)
+    time_tc = np.asarray(time_tc, dtype=np.int64)
+    tc_values = np.asarray(tc_values, dtype=np.float64)
+
+    # Both logs start in the same test, but possibly on either side of midnight
+    time_tc = time_tc - DAY_MS*np.round((time_tc[0] - time_main[0])/DAY_MS).astype(np.int64)
+
+    if method == 'nearest':
+        main = pd.DataFrame({'time_ms': time_main, 'row': np.arange(len(time_main))})
+        tc = pd.DataFrame(tc_values, columns=range(tc_values.shape[1]))
+        tc.insert(0, 'time_ms', time_tc)
+        merged = pd.merge_asof(main.sort_values('time_ms'), tc.sort_values('time_ms'), on='time_ms',
+                               direction='nearest', tolerance=tolerance_ms)
+        aligned = np.empty((len(time_main), tc_values.shape[1]))
+        aligned[merged['row'].to_numpy()] = merged[list(range(tc_values.shape[1]))].to_numpy()
+        return aligned
+
+    if method == 'interpolate':
+        order = np.argsort(time_tc, kind='stable')
+        aligned = np.empty((len(time_main), tc_values.shape[1]))
+        for channel in range(tc_values.shape[1]):
+            aligned[:, channel] = np.interp(time_main, time_tc[order], tc_values[order, channel],
+                                            left=np.nan, right=np.nan)
+        return aligned
+
+    raise ValueError("method must be 'nearest' or 'interpolate', not %r" % method)
+
+
+def load_aligned_run(key, columns=None, data_folder='.', method='nearest', tolerance_ms=None):
+    """
+    One table per run with the main log and the thermocouple channels.
+
+    Returns the selected main log columns (by name, see variables_list), the
+    unwrapped time stamps as 'time_ms' and the channels T_tc1..T_tc6 sampled
+    at the rows of the main log.
+    """
+    data = load_run(key, columns, data_folder)
+    data['time_ms'] = run_time_ms(key, data_folder)
+
+    tc_names = tc_variables_list[1:]
+    tc = load_run(key, tc_names, data_folder, thermocouple=True)
+    aligned = align_streams(data['time_ms'].to_numpy(), run_time_ms(key, data_folder, thermocouple=True),
+                            tc.to_numpy(), method, tolerance_ms)
+    for channel, name in enumerate(tc_names):
+        data[name] = aligned[:, channel]
+    return data
+
+
+def load_aligned_runs(keys, columns=None, data_folder='.', method='nearest', tolerance_ms=None, max_workers=None):
+    """Aligned main + thermocouple tables of many runs, loaded in a thread pool."""
+    keys = list(keys)
+    if max_workers is None:
+        max_workers = min(len(keys), os.cpu_count() or 1) or 1
+
+    def load(key):
+        return load_aligned_run(key, columns, data_folder, method, tolerance_ms)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(keys, executor.map(load, keys)))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo propagation of the flow meter errors to phi and u_u.
+
+phi_meas and u_u_meas follow from the flows of air 1, DNG and H2 (see
+derived). ``monte_carlo_events`` draws perturbed flows for every event at
+once, an (n_events, n_samples) array per meter with relative (of reading)
+and absolute (of full scale) errors, pushes them through the phi and u_u
+relations of derived.derive_quantities in one batched evaluation and
+reduces the samples to the mean and covariance of (phi, u_u) per event.
+With `chunk_size` the samples are drawn in chunks and only the sums of the
+moments are kept, so the memory stays bounded for any number of samples.
+``confidence_ellipses`` turns the covariances into ellipses and
+``plot_ellipses`` draws them on an FB map as one collection.
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.collections import EllipseCollection
+
+from flashback_tools.derived import RAW_COLUMNS, derive_quantities
+
+# Accuracy of the flow meters: error of reading [-], error of full scale [-]
+# and full scale [ln/min]. The errors are taken as the 95% bounds (2 sigma)
+# of normally distributed errors. Typical values of thermal mass flow
+# controllers, replace by the specs of the calibration certificates.
+FLOW_METER_SPECS = {'Q_a1_meas': {'reading': 0.005, 'full_scale': 0.001, 'range': 1000.0},
+                    'Q_DNG_meas': {'reading': 0.005, 'full_scale': 0.001, 'range': 50.0},
+                    'Q_H2_meas': {'reading': 0.005, 'full_scale': 0.001, 'range': 100.0}}
+
+# Default number of Monte Carlo samples per event
+MC_SAMPLES = 4000
+
+
+def _draw_flows(values, n_samples, specs, rng):
+    # Perturbed flows (n_events, n_samples) of every flow meter
+    flows = {}
+    for name, spec in specs.items():
+        reading = values[name][:, np.newaxis]
+        relative = rng.standard_normal((len(reading), n_samples))*spec['reading']/2
+        absolute = rng.standard_normal((len(reading), n_samples))*spec['full_scale']*spec['range']/2
+        flows[name] = np.maximum(reading*(1 + relative) + absolute, 0.0)
+    return flows
+
+
+def monte_carlo_events(event_values, n_samples=MC_SAMPLES, specs=None, chunk_size=None, seed=0, constants=None):
+    """
+    Mean and covariance of (phi, u_u) at every event from perturbed flows.
+
+    `event_values` is a DataFrame with the columns RAW_COLUMNS at the event
+    frames, e.g. build_event_table(flashback_data, columns=RAW_COLUMNS),
+    `specs` replaces entries of FLOW_METER_SPECS and `constants` is passed
+    to derive_quantities. With `chunk_size` at most that many samples per
+    event are drawn at a time. Returns a DataFrame with the same index and the
+    columns phi_mean, u_u_mean, phi_std, u_u_std and phi_u_u_cov.
+    """
+    specs = dict(FLOW_METER_SPECS, **(specs or {}))
+    values = {name: event_values[name].to_numpy(dtype=np.float64) for name in RAW_COLUMNS}
+    fixed = {name: values[name][:, np.newaxis] for name in RAW_COLUMNS if name not in specs}
+    rng = np.random.default_rng(seed)
+    chunk_size = n_samples if chunk_size is None else chunk_size
+
+    n_events = len(event_values)
+    sums = np.zeros((n_events, 5))   # phi, u_u, phi^2, u_u^2, phi*u_u
+    n = np.zeros(n_events)
+    for start in range(0, n_samples, chunk_size):
+        flows = _draw_flows(values, min(chunk_size, n_samples - start), specs, rng)
+        derived = derive_quantities(dict(fixed, **flows), constants)
+        phi, u_u = derived['phi_meas'], derived['u_u_meas']
+        valid = np.isfinite(phi) & np.isfinite(u_u)
+        phi, u_u = np.where(valid, phi, 0.0), np.where(valid, u_u, 0.0)
+        sums += np.column_stack([phi.sum(axis=1), u_u.sum(axis=1), (phi**2).sum(axis=1), (u_u**2).sum(axis=1),
+                                 (phi*u_u).sum(axis=1)])
+        n += valid.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums[:, :2]/n[:, np.newaxis]
+        second = (sums[:, 2:] - n[:, np.newaxis]*np.column_stack([mean[:, 0]**2, mean[:, 1]**2, mean[:, 0]*mean[:, 1]]))
+        second /= (n - 1)[:, np.newaxis]
+    return pd.DataFrame({'phi_mean': mean[:, 0], 'u_u_mean': mean[:, 1],
+                         'phi_std': np.sqrt(np.maximum(second[:, 0], 0)), 'u_u_std': np.sqrt(np.maximum(second[:, 1], 0)),
+                         'phi_u_u_cov': second[:, 2]}, index=event_values.index)
+
+
+def confidence_ellipses(mc_table, confidence=0.95):
+    """
+    Confidence ellipses of (phi, u_u) of a Monte Carlo table: adds the full
+    axes 'ellipse_width' (along the first principal axis) and
+    'ellipse_height' and the angle 'ellipse_angle' [degrees] to a copy.
+    """
+    var_phi, var_u = mc_table['phi_std'].to_numpy()**2, mc_table['u_u_std'].to_numpy()**2
+    cov = mc_table['phi_u_u_cov'].to_numpy()
+
+    # Eigenvalues and direction of the first eigenvector of the 2x2 covariance matrices
+    half_trace = (var_phi + var_u)/2
+    root = np.sqrt(((var_phi - var_u)/2)**2 + cov**2)
+    scale = -2*np.log(1 - confidence)   # chi-square quantile with 2 degrees of freedom
+    table = mc_table.copy()
+    table['ellipse_width'] = 2*np.sqrt(scale*(half_trace + root))
+    table['ellipse_height'] = 2*np.sqrt(scale*np.maximum(half_trace - root, 0))
+    table['ellipse_angle'] = np.degrees(np.arctan2(2*cov, var_phi - var_u)/2)
+    return table
+
+
+def plot_ellipses(ellipses, colors=None, ax=None, **kwargs):
+    """
+    Draw the confidence ellipses (see confidence_ellipses) in data units, as
+    one collection. `colors` maps the hydrogen percentages to edge colors,
+    else the ellipses are black. Returns the collection.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if colors is None:
+        edgecolors = 'k'
+    else:
+        edgecolors = [colors[H] for H in ellipses.index.get_level_values('hydrogen_percentage')]
+    kwargs = dict({'facecolors': 'none', 'linewidths': 0.8, 'alpha': 0.8, 'zorder': 1}, **kwargs)
+    collection = EllipseCollection(ellipses['ellipse_width'].to_numpy(), ellipses['ellipse_height'].to_numpy(),
+                                   ellipses['ellipse_angle'].to_numpy(), units='xy',
+                                   offsets=ellipses[['phi_mean', 'u_u_mean']].to_numpy(),
+                                   offset_transform=ax.transData, edgecolors=edgecolors, **kwargs)
+    ax.add_collection(collection)
+    return collection
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Agreement of the flashback event detector with the hand-annotated runs of
+Steel liner set 1, at the default DETECTOR_SETTINGS.
+"""
+
+import os
+import sys
+
+import pytest
+
+PHD_DATA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PHD_DATA)
+
+from flashback_tools import Catalog, compare_with_annotations, detect_session  # noqa: E402
+
+LINER_SET = os.path.join(PHD_DATA, 'Steel liner set 1')
+
+# Fraction of the annotated runs for which the detector is within 25 frames of the annotation
+MIN_AGREEMENT = {'design': 0.35, 'first_sign_FB': 0.55, 'FB': 0.82}
+
+
+@pytest.fixture(scope='module')
+def detection_report():
+    flashback_data = Catalog.open(LINER_SET).flashback_data()
+    detected = detect_session(flashback_data.keys(), LINER_SET)
+    return compare_with_annotations(detected, flashback_data)
+
+
+def test_all_annotated_runs_are_detected(detection_report):
+    assert len(detection_report) == 3*56
+
+
+@pytest.mark.parametrize('event', list(MIN_AGREEMENT))
+def test_agreement_with_annotations(detection_report, event):
+    agreement = detection_report.xs(event, level='event')['agrees'].mean()
+    assert agreement >= MIN_AGREEMENT[event]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Every event of Steel liner set 1 must lie inside the default grid of the
+laminar flame speed table, otherwise its u_u/S_L is NaN.
+"""
+
+import os
+import sys
+
+PHD_DATA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PHD_DATA)
+sys.path.append(os.path.join(os.path.dirname(PHD_DATA), 'physics'))
+
+from flashback_tools import Catalog, build_event_table  # noqa: E402
+from flame_tools import FlameSpeedTable  # noqa: E402
+
+LINER_SET = os.path.join(PHD_DATA, 'Steel liner set 1')
+
+OPERATING_POINT = ['x_H2_meas', 'phi_meas', 'T_u_ambient', 'p_u_ambient']
+
+
+def test_events_inside_default_grid(tmp_path):
+    flashback_data = Catalog.open(LINER_SET).flashback_data()
+    event_table = build_event_table(flashback_data, columns=OPERATING_POINT, data_folder=LINER_SET)
+    # A table that does not exist yet is opened empty on DEFAULT_GRID
+    table = FlameSpeedTable.open(str(tmp_path / 'flame_speed_table.npz'))
+    outside = table.outside(*[event_table[column] for column in OPERATING_POINT])
+    assert not outside.any(), event_table.loc[outside, OPERATING_POINT]
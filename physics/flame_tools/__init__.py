@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for the Cantera flame speed notebooks in this folder.
+
+The notebooks run from this folder, so ``import flame_tools`` works directly.
+"""
+
+from flame_tools.flames import flame_speed, fuel_blend, premixed_gas, solve_flame, make_gas, save_flame, restore_flame
+from flame_tools.lookup import FlameSpeedTable
+from flame_tools.continuation import sweep
+from flame_tools.refinement import compare_refinement, staged_solve
+from flame_tools.sensitivity import adjoint_sensitivities, benchmark_sensitivities, brute_force_sensitivities
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Warm-started continuation sweeps over the equivalence ratio and the hydrogen
+fraction of the DNG/H2 fuel.
+
+``sweep`` walks the (x_H2, phi) grid in small steps: x_H2 in the outer loop
+and phi back and forth (snake order), so every point is a neighbour of the
+previous one. The converged profile and grid of the previous point are the
+initial guess of the next one, which skips most of the grid refinement and
+the initial Newton iterations of a cold start. A warm solve that fails (or
+ends up at the unburned mixture) falls back to a cold start.
+
+Warm and cold solutions meet the same refine criteria, but grid refinement
+only adds points, so a warm solution keeps the extra points of its
+predecessors and ends on a finer grid. The flame speeds of both are
+therefore equal only to within the discretization error of the refine
+criteria: with REFINE_CRITERIA (slope = curve = 0.1) about 1-2% at x_H2 =
+1 (phi = 0.6: cold 0.783 m/s on 118 points, warm 0.795-0.804 m/s on 143-158
+points, against 0.796 m/s for a cold start with slope = curve = 0.05 on 206
+points). Pass tighter `refine_criteria` when the sweep has to agree with
+cold solves more closely; the warm solutions are the better resolved ones.
+
+Every converged flame is saved as a checkpoint in `store_dir`, together with
+an index of the results and the settings they were solved with (mechanism,
+DNG composition, domain width and refine criteria). An interrupted sweep
+resumes from the checkpoints: points in the index are not solved again and
+the next warm start is restored from the last checkpoint. When the settings
+changed, the index and its checkpoints are discarded.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import cantera as ct
+
+from flame_tools.flames import (AIR, DNG_COMPOSITION, LEAN_FLAME_WIDTH, REFINE_CRITERIA, flame_speed, fuel_blend,
+                                is_burning, premixed_gas, restore_flame, save_flame)
+
+# Index of the results in the checkpoint store
+SWEEP_INDEX = 'sweep.json'
+
+# Columns of the table returned by sweep
+SWEEP_COLUMNS = ['x_H2', 'phi', 'S_L', 'start', 'solve_time', 'jacobians', 'evaluations', 'time_steps', 'grid_points']
+
+
+def sweep_order(x_H2_values, phi_values):
+    """(x_H2, phi) points in continuation order: x_H2 ascending, phi back and forth."""
+    phi_values = sorted(phi_values)
+    points = []
+    for i, x_H2 in enumerate(sorted(x_H2_values)):
+        points += [(x_H2, phi) for phi in (phi_values if i % 2 == 0 else phi_values[::-1])]
+    return points
+
+
+def checkpoint_name(x_H2, phi, T, P):
+    """File name of the checkpoint of one point."""
+    return 'x_H2={:.4f}_phi={:.4f}_T={:.2f}_P={:.0f}.yaml'.format(x_H2, phi, T, P)
+
+
+def _solve_statistics(flame):
+    return {'jacobians': int(np.sum(flame.jacobian_count_stats)),
+            'evaluations': int(np.sum(flame.eval_count_stats)),
+            'time_steps': int(np.sum(flame.time_step_stats)),
+            'grid_points': len(flame.grid)}
+
+
+def _warm_solve(flame, X, T, P):
+    # New inlet state, the current solution of the flame is the initial guess
+    flame.inlet.T = T
+    flame.inlet.X = X
+    flame.P = P
+    flame.solve(loglevel=0, refine_grid=True, auto=False)
+    return flame
+
+
+def _cold_solve(gas, width, refine_criteria):
+    flame = ct.FreeFlame(gas, width=width)
+    flame.set_refine_criteria(**refine_criteria)
+    flame.solve(loglevel=0, auto=True)
+    return flame
+
+
+def _read_index(store_dir, settings):
+    # Points of the index, discarded with their checkpoints if they were solved with other settings
+    index_file = os.path.join(store_dir, SWEEP_INDEX)
+    if not os.path.isfile(index_file):
+        return {}
+    with open(index_file) as f:
+        index = json.load(f)
+    if index.get('settings') == settings:
+        return index['points']
+    points = index.get('points', {}) if 'settings' in index else index
+    for point in points.values():
+        if point.get('checkpoint') and os.path.isfile(os.path.join(store_dir, point['checkpoint'])):
+            os.remove(os.path.join(store_dir, point['checkpoint']))
+    return {}
+
+
+def _write_index(store_dir, settings, points):
+    temporary = os.path.join(store_dir, SWEEP_INDEX + '.tmp')
+    with open(temporary, 'w') as f:
+        json.dump({'settings': settings, 'points': points}, f, indent=1, sort_keys=True)
+    os.replace(temporary, os.path.join(store_dir, SWEEP_INDEX))
+
+
+def sweep(mechanism, x_H2_values, phi_values, T, P, store_dir, dng=DNG_COMPOSITION, width=LEAN_FLAME_WIDTH,
+          refine_criteria=REFINE_CRITERIA, verbose=True):
+    """
+    Laminar flame speed at all (x_H2, phi) points at temperature T [K] and
+    pressure P [Pa], solved by warm-started continuation.
+
+    Returns a DataFrame in continuation order with the columns of
+    SWEEP_COLUMNS: S_L [m/s] (NaN if the mixture does not burn), how the
+    point was started ('warm', 'cold', 'failed' or 'checkpoint' for points of
+    an earlier run), the solve time [s], the number of Jacobian and residual
+    evaluations and time steps, and the final number of grid points. Warm
+    and cold points agree to within the discretization error of
+    `refine_criteria`, see the module docstring.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    # Round trip through JSON so the settings compare equal to those of the index
+    settings = json.loads(json.dumps({'mechanism': mechanism, 'dng': dng, 'width': width,
+                                      'refine_criteria': refine_criteria}, sort_keys=True))
+    index = _read_index(store_dir, settings)
+    gas = premixed_gas(mechanism, 0.0, 1.0, T, P, dng)
+
+    flame = None
+    last_checkpoint = None
+    rows = []
+    for x_H2, phi in sweep_order(x_H2_values, phi_values):
+        name = checkpoint_name(x_H2, phi, T, P)
+        if name in index:
+            rows.append(dict(index[name], start='checkpoint'))
+            if index[name]['start'] != 'failed':
+                flame, last_checkpoint = None, index[name]
+            continue
+
+        gas.TP = T, P
+        gas.set_equivalence_ratio(phi, fuel_blend(x_H2, dng), AIR)
+        X = gas.X
+
+        if flame is None and last_checkpoint is not None:
+            # Resume: restore the last converged flame of the previous run
+            _, flame = restore_flame(mechanism, T, P, X, os.path.join(store_dir, last_checkpoint['checkpoint']))
+
+        start = time.perf_counter()
+        result = None
+        if flame is not None:
+            flame.clear_stats()
+            try:
+                _warm_solve(flame, X, T, P)
+                if is_burning(flame):
+                    result = 'warm'
+            except ct.CanteraError:
+                pass
+        if result is None:
+            try:
+                flame = _cold_solve(gas, width, refine_criteria)
+                result = 'cold' if is_burning(flame) else 'failed'
+            except ct.CanteraError:
+                result = 'failed'
+        solve_time = time.perf_counter() - start
+
+        row = {'x_H2': x_H2, 'phi': phi, 'start': result, 'solve_time': solve_time}
+        if result == 'failed':
+            flame = None
+            row.update(S_L=np.nan, jacobians=0, evaluations=0, time_steps=0, grid_points=0, checkpoint=None)
+        else:
+            checkpoint = os.path.join(store_dir, name)
+            if os.path.isfile(checkpoint):
+                # Left behind by an interrupted run, before it was added to the index
+                os.remove(checkpoint)
+            save_flame(flame, checkpoint)
+            row.update(_solve_statistics(flame), S_L=flame_speed(flame), checkpoint=name)
+            last_checkpoint = row
+
+        index[name] = row
+        _write_index(store_dir, settings, index)
+        rows.append(row)
+        if verbose:
+            print('x_H2 = {:.2f}, phi = {:.2f}: S_L = {:.3f} m/s ({}, {:.1f} s)'.format(x_H2, phi, row['S_L'],
+                                                                                       result, solve_time))
+
+    return pd.DataFrame(rows, columns=SWEEP_COLUMNS)
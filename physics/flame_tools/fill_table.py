@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Fill the missing points of a laminar flame speed table (see lookup).
+
+Run from the physics folder, e.g.
+
+    python -m flame_tools.fill_table flame_speed_table.npz --workers 4
+
+The fill runs in a process pool; as an entry point of its own (not imported
+by the package) it is safe under the spawn start method.
+"""
+
+import argparse
+
+from flame_tools.lookup import FlameSpeedTable
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filename', help='.npz file of the table, created on DEFAULT_GRID if it does not exist')
+    parser.add_argument('--mechanism', default='gri30.yaml', help='kinetic mechanism')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    table = FlameSpeedTable.open(args.filename, mechanism=args.mechanism)
+    print('{} of {} points missing'.format(len(table.missing()), table.solved.size))
+    table.fill(max_workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
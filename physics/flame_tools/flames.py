@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Small helpers around ``ct.Solution`` and ``ct.FreeFlame`` shared by the other
+modules. They hide the differences between Cantera versions (e.g. ``flame.u``
+versus ``flame.velocity``) and move converged flames between processes.
+"""
+
+import cantera as ct
+
+# Composition of the Dutch natural gas (DNG) in the session logs (x_CH4_set, x_C2H6_set, x_N2_set)
+DNG_COMPOSITION = {'CH4': 0.8187, 'C2H6': 0.0373, 'N2': 0.144}
+
+# Oxidizer of the notebooks and the combustor
+AIR = {'O2': 1.0, 'N2': 3.76}
+
+# Domain width [m] and grid refinement criteria of the flame notebook
+FLAME_WIDTH = 0.014
+REFINE_CRITERIA = {'ratio': 3, 'slope': 0.1, 'curve': 0.1}
+
+# Domain width [m] for lean mixtures: these flames are thick and do not
+# converge on the 14 mm domain of the notebook
+LEAN_FLAME_WIDTH = 0.03
+
+# Temperature rise [K] below which a solution is not a burning flame
+MIN_TEMPERATURE_RISE = 100.0
+
+
+def flame_speed(flame):
+    """Laminar flame speed [m/s]: the inlet velocity of a converged FreeFlame."""
+    if hasattr(flame, 'velocity'):
+        return flame.velocity[0]
+    return flame.u[0]
+
+
+def fuel_blend(x_H2, dng=DNG_COMPOSITION):
+    """Mole fractions of a DNG/H2 fuel with volume fraction x_H2 [-] of hydrogen."""
+    fuel = {species: (1 - x_H2)*x for species, x in dng.items()}
+    fuel['H2'] = fuel.get('H2', 0) + x_H2
+    return fuel
+
+
+def premixed_gas(mechanism, x_H2, phi, T, P, dng=DNG_COMPOSITION, oxidizer=AIR):
+    """Solution of `mechanism` with a DNG/H2-air mixture at equivalence ratio phi, T [K] and P [Pa]."""
+    gas = ct.Solution(mechanism)
+    gas.TP = T, P
+    gas.set_equivalence_ratio(phi, fuel_blend(x_H2, dng), oxidizer)
+    return gas
+
+
+def solve_flame(gas, width=FLAME_WIDTH, refine_criteria=REFINE_CRITERIA, loglevel=0):
+    """New FreeFlame of `gas`, solved with automatic grid refinement."""
+    flame = ct.FreeFlame(gas, width=width)
+    flame.set_refine_criteria(**refine_criteria)
+    flame.solve(loglevel=loglevel, auto=True)
+    return flame
+
+
+def is_burning(flame):
+    """True if the solution of `flame` is a burning flame and not the unburned mixture."""
+    return flame.T[-1] - flame.T[0] >= MIN_TEMPERATURE_RISE
+
+
+def make_gas(mechanism, T, P, X):
+    """Solution of `mechanism` at temperature T [K], pressure P [Pa] and mole fractions X."""
+    gas = ct.Solution(mechanism)
+    gas.TPX = T, P, X
+    return gas
+
+
+def save_flame(flame, filename, name='solution'):
+    """Write a (converged) flame to a YAML file so it can be restored in another process."""
+    flame.save(filename, name=name)
+
+
+def restore_flame(mechanism, T, P, X, filename, name='solution', transport_model=None):
+    """
+    New gas and FreeFlame restored from a file written by save_flame.
+
+    The restored flame has the grid and profiles of the saved one and can be
+    re-solved without grid refinement straight away.
+    """
+    gas = make_gas(mechanism, T, P, X)
+    flame = ct.FreeFlame(gas, width=0.01)
+    if transport_model is not None:
+        flame.transport_model = transport_model
+    flame.restore(filename, name=name)
+    return gas, flame
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent lookup table of the laminar flame speed S_L over the operating
+envelope of the combustor.
+
+The table is a regular grid over (x_H2, phi, T_u, p_u): the volume fraction
+of hydrogen in the DNG/H2 fuel, the equivalence ratio and the temperature [K]
+and pressure [Pa] of the unburned mixture, the quantities x_H2_meas,
+phi_meas, T_u_ambient and p_u_ambient in the session logs. It is stored in
+one ``.npz`` file together with a mask of the grid points that have been
+solved, so ``fill`` can be interrupted and resumed: it only solves the
+missing points (in a process pool) and writes the file after every point.
+``interpolate`` is multilinear and works on whole arrays of operating
+points, no solver is involved.
+
+The table is filled from this folder with
+
+    python -m flame_tools.fill_table flame_speed_table.npz
+
+so the process pool never re-imports a post-processing script; the scripts
+only open the table and interpolate.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import cantera as ct
+
+from flame_tools.flames import (DNG_COMPOSITION, LEAN_FLAME_WIDTH, REFINE_CRITERIA, flame_speed, is_burning,
+                                premixed_gas, solve_flame)
+
+# Axes of the table, in order
+TABLE_AXES = ['x_H2', 'phi', 'T_u', 'p_u']
+
+# Default grid, covering the sessions of steel liner set 1 (phi_meas down to 0.2996 in the H100 runs at phi 0.30)
+DEFAULT_GRID = {'x_H2': np.linspace(0, 1, 9),
+                'phi': np.array([0.25, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1]),
+                'T_u': np.array([288.15, 298.15]),
+                'p_u': np.array([100000.0, 105000.0])}
+
+
+def _solve_point(mechanism, dng, x_H2, phi, T_u, p_u):
+    # S_L [m/s] at one grid point, NaN if the mixture does not burn or the solver fails
+    try:
+        gas = premixed_gas(mechanism, x_H2, phi, T_u, p_u, dng)
+        flame = solve_flame(gas, LEAN_FLAME_WIDTH, REFINE_CRITERIA)
+    except ct.CanteraError:
+        return np.nan
+    return flame_speed(flame) if is_burning(flame) else np.nan
+
+
+class FlameSpeedTable:
+    """
+    S_L on a regular (x_H2, phi, T_u, p_u) grid, stored in `filename`.
+
+    Use ``FlameSpeedTable.open`` to load an existing table or start a new
+    one. Grid points that were not solved yet, or where the mixture does not
+    burn, are NaN.
+    """
+
+    def __init__(self, filename, grid, S_L, solved, mechanism, dng):
+        self.filename = filename
+        self.grid = {axis: np.asarray(grid[axis], dtype=np.float64) for axis in TABLE_AXES}
+        self.S_L = S_L
+        self.solved = solved
+        self.mechanism = mechanism
+        self.dng = dict(dng)
+
+    @classmethod
+    def open(cls, filename, grid=None, mechanism='gri30.yaml', dng=DNG_COMPOSITION):
+        """
+        Load the table in `filename`, or start an empty one on `grid` (default
+        DEFAULT_GRID) if the file does not exist yet. A stored table must have
+        been made with the same mechanism and DNG composition.
+        """
+        if not os.path.isfile(filename):
+            grid = dict(DEFAULT_GRID, **(grid or {}))
+            shape = tuple(len(grid[axis]) for axis in TABLE_AXES)
+            return cls(filename, grid, np.full(shape, np.nan), np.zeros(shape, dtype=bool), mechanism, dng)
+
+        with np.load(filename) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['mechanism'] != mechanism or meta['dng'] != dict(dng):
+                raise ValueError('{} was made with {} and DNG {}'.format(filename, meta['mechanism'], meta['dng']))
+            table = cls(filename, {axis: data[axis] for axis in TABLE_AXES}, data['S_L'], data['solved'],
+                        mechanism, dng)
+        if grid is not None and any(not np.array_equal(table.grid[axis], grid[axis]) for axis in grid):
+            raise ValueError('{} has a different grid, use another file name'.format(filename))
+        return table
+
+    def save(self):
+        """Write the table, via a temporary file so an interrupted write never corrupts it."""
+        meta = json.dumps({'mechanism': self.mechanism, 'dng': self.dng})
+        temporary = self.filename + '.tmp.npz'
+        np.savez(temporary, S_L=self.S_L, solved=self.solved, meta=np.array(meta), **self.grid)
+        os.replace(temporary, self.filename)
+
+    def missing(self):
+        """Grid indices (tuples) of the points that have not been solved yet."""
+        return [tuple(index) for index in np.argwhere(~self.solved)]
+
+    def fill(self, max_workers=None, verbose=True):
+        """
+        Solve all missing grid points in a process pool and save the table
+        after every point, so an interrupted fill resumes where it stopped.
+        Like every process pool this needs the ``if __name__ == '__main__':``
+        guard around all work of the calling script, see fill_table. Returns the
+        number of solved points.
+        """
+        todo = self.missing()
+        if not todo:
+            return 0
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for index in todo:
+                point = [self.grid[axis][i] for axis, i in zip(TABLE_AXES, index)]
+                futures[executor.submit(_solve_point, self.mechanism, self.dng, *point)] = index
+            for n, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                self.S_L[index] = future.result()
+                self.solved[index] = True
+                self.save()
+                if verbose:
+                    print('{}/{} points, {:.0f} s'.format(n, len(todo), time.time() - start))
+        return len(todo)
+
+    def outside(self, x_H2, phi, T_u, p_u):
+        """
+        Boolean mask of the operating points (arrays, broadcast against each
+        other) that lie outside the grid or have a NaN coordinate. These are
+        not extrapolated, check them before filling the table.
+        """
+        points = np.broadcast_arrays(*[np.asarray(value, dtype=np.float64) for value in (x_H2, phi, T_u, p_u)])
+        outside = np.zeros(points[0].shape, dtype=bool)
+        for axis, values in zip(TABLE_AXES, points):
+            nodes = self.grid[axis]
+            outside |= (values < nodes[0]) | (values > nodes[-1]) | np.isnan(values)
+        return outside
+
+    def interpolate(self, x_H2, phi, T_u, p_u):
+        """
+        Multilinear interpolation of S_L [m/s] at arrays of operating points
+        (broadcast against each other). Points outside the grid (see outside),
+        or next to a grid point without a flame, are NaN.
+        """
+        points = np.broadcast_arrays(*[np.asarray(value, dtype=np.float64) for value in (x_H2, phi, T_u, p_u)])
+        shape = points[0].shape
+        lower, weights = [], []
+        for axis, values in zip(TABLE_AXES, points):
+            nodes = self.grid[axis]
+            if len(nodes) == 1:
+                lower.append(np.zeros(shape, dtype=np.int64))
+                weights.append(np.zeros(shape))
+                continue
+            i = np.clip(np.searchsorted(nodes, values, side='right') - 1, 0, len(nodes) - 2)
+            lower.append(i)
+            weights.append((values - nodes[i])/(nodes[i + 1] - nodes[i]))
+
+        S_L = np.zeros(shape)
+        # Sum over the 2**4 corners of the grid cell of every point
+        for corner in np.ndindex(*(2,)*len(TABLE_AXES)):
+            weight = np.ones(shape)
+            index = []
+            for axis, offset in enumerate(corner):
+                weight = weight*(weights[axis] if offset else 1 - weights[axis])
+                index.append(np.minimum(lower[axis] + offset, len(self.grid[TABLE_AXES[axis]]) - 1))
+            corner_values = self.S_L[tuple(index)]
+            S_L += np.where(weight == 0, 0, weight*corner_values)
+
+        S_L[self.outside(*points)] = np.nan
+        return S_L
+
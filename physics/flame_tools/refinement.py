@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Staged coarse-to-fine grid refinement of flame solves.
+
+The notebook solves on a FLAME_WIDTH domain with the strict refine criteria
+of REFINE_CRITERIA straight away, so most of the work goes into refining a grid around profiles
+that are still far from the solution. ``staged_solve`` first converges on
+loose criteria and then tightens ratio/slope/curve stage by stage, every
+stage starting from the solution of the previous one. With a `tolerance` it
+stops as soon as the flame speed changes less than that (relative) between
+two stages. ``compare_refinement`` reports wall time, final grid points and
+the flame speed error of the staged profile against the single-stage solve;
+by default both use the width and refine criteria of the notebook.
+"""
+
+import time
+
+import pandas as pd
+import cantera as ct
+
+from flame_tools.flames import AIR, DNG_COMPOSITION, FLAME_WIDTH, REFINE_CRITERIA, flame_speed, premixed_gas
+
+# Refine criteria of the stages, from loose to the strict criteria of the notebook
+REFINEMENT_STAGES = [{'ratio': 5, 'slope': 0.6, 'curve': 0.8},
+                     {'ratio': 4, 'slope': 0.3, 'curve': 0.4},
+                     {'ratio': 3, 'slope': 0.1, 'curve': 0.1}]
+
+
+def staged_solve(gas, width=FLAME_WIDTH, stages=REFINEMENT_STAGES, tolerance=None, loglevel=0):
+    """
+    New FreeFlame of `gas`, solved with stage by stage tighter refine criteria.
+
+    The first stage is solved with auto=True, the next ones start from the
+    previous solution. If `tolerance` is given, the solve stops after the
+    first stage at which the flame speed changed less than `tolerance`
+    (relative) compared to the previous stage. Returns the flame and a list
+    with per stage the criteria, flame speed [m/s], grid points and wall time [s].
+    """
+    flame = ct.FreeFlame(gas, width=width)
+    history = []
+    for i, criteria in enumerate(stages):
+        start = time.perf_counter()
+        flame.set_refine_criteria(**criteria)
+        if i == 0:
+            flame.solve(loglevel=loglevel, auto=True)
+        else:
+            flame.solve(loglevel=loglevel, refine_grid=True, auto=False)
+        history.append(dict(criteria, S_L=flame_speed(flame), grid_points=len(flame.grid),
+                            wall_time=time.perf_counter() - start))
+
+        if tolerance is not None and i > 0:
+            change = abs(history[-1]['S_L'] - history[-2]['S_L'])/abs(history[-2]['S_L'])
+            if change < tolerance:
+                break
+    return flame, history
+
+
+def compare_refinement(mechanism, points, dng=DNG_COMPOSITION, width=FLAME_WIDTH, stages=REFINEMENT_STAGES,
+                       tolerance=None, refine_criteria=REFINE_CRITERIA):
+    """
+    Staged versus single-stage solves at the operating points `points`, a list
+    of (x_H2, phi, T [K], P [Pa]). The single-stage solve uses `width` [m] and
+    `refine_criteria`, pass those of the notebook solve it stands for.
+
+    Returns a DataFrame with one row per point with the wall time [s], final
+    grid points and flame speed [m/s] of both profiles, the relative flame
+    speed error of the staged profile and the speed-up.
+    """
+    rows = []
+    for x_H2, phi, T, P in points:
+        gas = premixed_gas(mechanism, x_H2, phi, T, P, dng, AIR)
+        start = time.perf_counter()
+        single = ct.FreeFlame(gas, width=width)
+        single.set_refine_criteria(**refine_criteria)
+        single.solve(loglevel=0, auto=True)
+        single_time = time.perf_counter() - start
+
+        gas = premixed_gas(mechanism, x_H2, phi, T, P, dng, AIR)
+        start = time.perf_counter()
+        staged, history = staged_solve(gas, width, stages, tolerance)
+        staged_time = time.perf_counter() - start
+
+        S_L_single, S_L_staged = flame_speed(single), flame_speed(staged)
+        rows.append({'x_H2': x_H2, 'phi': phi, 'T': T, 'P': P,
+                     'single_time': single_time, 'single_grid_points': len(single.grid), 'single_S_L': S_L_single,
+                     'staged_time': staged_time, 'staged_grid_points': len(staged.grid), 'staged_S_L': S_L_staged,
+                     'stages': len(history), 'S_L_error': (S_L_staged - S_L_single)/S_L_single,
+                     'speed_up': single_time/staged_time})
+    return pd.DataFrame(rows)
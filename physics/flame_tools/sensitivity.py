@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Flame speed sensitivities d ln(Su)/d ln(k) of the reactions.
+
+Two modes that return the same table:
+
+- ``brute_force_sensitivities``: finite differences, distributed over a
+  process pool;
+- ``adjoint_sensitivities``: all reactions from one adjoint solve on the
+  converged flame, about the cost of a single Newton step.
+
+``benchmark_sensitivities`` runs both on the same flame and reports the wall
+time and the deviation of the adjoint result, to pick a mode per mechanism.
+
+Brute force:
+
+For every reaction m the rate multiplier is set to 1 + dk and the flame is
+re-solved without grid refinement, the sensitivity is
+(Su - Su0)/(Su0*dk). The converged base flame is written to a temporary file
+once; every worker restores its own Solution/FreeFlame from it and then
+handles a share of the reactions, so the ~n_reactions Newton solves run in
+parallel.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from flame_tools.flames import flame_speed, restore_flame, save_flame
+
+# Flame and gas of a worker process, created once by _init_worker
+_worker = {}
+
+
+def _init_worker(mechanism, T, P, X, state_file, transport_model, dk, Su0):
+    gas, flame = restore_flame(mechanism, T, P, X, state_file, transport_model=transport_model)
+    _worker.update(gas=gas, flame=flame, dk=dk, Su0=Su0)
+
+
+def _perturbed_sensitivity(m):
+    gas, flame, dk, Su0 = _worker['gas'], _worker['flame'], _worker['dk'], _worker['Su0']
+    gas.set_multiplier(1.0) # reset all multipliers
+    gas.set_multiplier(1 + dk, m) # perturb reaction m
+
+    # Do not refine the grid, otherwise it is not strictly a small perturbation analysis
+    flame.solve(loglevel=0, refine_grid=False)
+    Su = flame_speed(flame)
+
+    gas.set_multiplier(1.0)
+    return (Su - Su0)/(Su0*dk)
+
+
+def brute_force_sensitivities(gas, flame, mechanism, dk=1e-2, reactions=None, column='baseCase', max_workers=None):
+    """
+    Sensitivities d ln(Su)/d ln(k) of all (or the given) reactions.
+
+    `flame` is the converged base FreeFlame of `gas` and `mechanism` the file
+    the gas was loaded from (needed to rebuild it in the workers). Returns a
+    DataFrame indexed by the reaction equations with one column `column`,
+    like the sensitivities table of the notebook. Like every process pool
+    this needs the ``if __name__ == '__main__':`` guard in plain scripts.
+    """
+    if reactions is None:
+        reactions = range(gas.n_reactions)
+    reactions = list(reactions)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    Su0 = flame_speed(flame)
+    T, P, X = flame.inlet.T, flame.P, flame.inlet.X
+
+    state_dir = tempfile.mkdtemp()
+    try:
+        state_file = os.path.join(state_dir, 'base_flame.yaml')
+        save_flame(flame, state_file)
+        initargs = (mechanism, T, P, X, state_file, flame.transport_model, dk, Su0)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as executor:
+            chunksize = max(1, len(reactions)//(4*max_workers))
+            values = list(executor.map(_perturbed_sensitivity, reactions, chunksize=chunksize))
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    return pd.DataFrame({column: values}, index=gas.reaction_equations(reactions))
+
+
+def adjoint_sensitivities(gas, flame, reactions=None, column='baseCase'):
+    """
+    Sensitivities d ln(Su)/d ln(k) of all (or the given) reactions from one
+    adjoint solve on the converged base FreeFlame. Returns the same table as
+    brute_force_sensitivities.
+    """
+    values = flame.get_flame_speed_reaction_sensitivities()
+    if reactions is None:
+        reactions = range(gas.n_reactions)
+    reactions = list(reactions)
+    return pd.DataFrame({column: values[reactions]}, index=gas.reaction_equations(reactions))
+
+
+def benchmark_sensitivities(gas, flame, mechanism, dk=1e-2, reactions=None, max_workers=None):
+    """
+    Wall time of both modes and the deviation of the adjoint sensitivities
+    from the finite-difference ones, for the converged base flame.
+
+    Returns (summary, sensitivities): a DataFrame indexed by mode with the
+    columns 'wall_time' [s], 'max_abs_deviation' and 'max_rel_deviation'
+    (relative to the largest sensitivity), and the table with both columns.
+    """
+    start = time.perf_counter()
+    brute_force = brute_force_sensitivities(gas, flame, mechanism, dk, reactions, 'brute_force', max_workers)
+    brute_force_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    adjoint = adjoint_sensitivities(gas, flame, reactions, 'adjoint')
+    adjoint_time = time.perf_counter() - start
+
+    sensitivities = pd.concat([brute_force, adjoint], axis=1)
+    deviation = np.abs(sensitivities['adjoint'] - sensitivities['brute_force']).max()
+    scale = np.abs(sensitivities['brute_force']).max()
+    summary = pd.DataFrame({'wall_time': [brute_force_time, adjoint_time],
+                            'max_abs_deviation': [0.0, deviation],
+                            'max_rel_deviation': [0.0, deviation/scale if scale > 0 else np.nan]},
+                           index=pd.Index(['brute_force', 'adjoint'], name='mode'))
+    return summary, sensitivities